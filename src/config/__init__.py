@@ -3,10 +3,17 @@ Moduł config - Konfiguracja aplikacji
 """
 
 from .settings import (
+    AFFINE_TRANSFORM_TOLERANCE,
+    API_BATCH_SIZE,
     API_MAX_RETRIES,
+    API_RETRY_BACKOFF,
     CONCURRENT_API_REQUESTS,
     DEBUG_MODE,
     DEFAULT_SPARSE_GRID_DISTANCE,
+    GEOPORTAL_CACHE_ENABLED,
+    GEOPORTAL_CACHE_MAX_AGE_DAYS,
+    INPUT_CACHE_ENABLED,
+    INPUT_CACHE_MAX_MB,
     ROUND_INPUT_DECIMALS,
 )
 
@@ -14,6 +21,13 @@ __all__ = [
     'DEBUG_MODE',
     'CONCURRENT_API_REQUESTS', 
     'API_MAX_RETRIES',
+    'API_RETRY_BACKOFF',
+    'API_BATCH_SIZE',
+    'GEOPORTAL_CACHE_ENABLED',
+    'GEOPORTAL_CACHE_MAX_AGE_DAYS',
+    'INPUT_CACHE_ENABLED',
+    'INPUT_CACHE_MAX_MB',
     'ROUND_INPUT_DECIMALS',
-    'DEFAULT_SPARSE_GRID_DISTANCE'
+    'DEFAULT_SPARSE_GRID_DISTANCE',
+    'AFFINE_TRANSFORM_TOLERANCE'
 ] 
\ No newline at end of file
@@ -7,6 +7,13 @@ Konfiguracja aplikacji diffH
 DEBUG_MODE = False
 CONCURRENT_API_REQUESTS = 50
 API_MAX_RETRIES = 5
+API_RETRY_BACKOFF = 0.5  # podstawa wykładniczego odstępu między ponowieniami zapytań (s)
+API_BATCH_SIZE = 300  # liczba punktów w jednym zapytaniu do API Geoportalu
+INPUT_CACHE_ENABLED = True  # zapis przetworzonych plików wejściowych w katalogu pamięci podręcznej użytkownika (Parquet, wymaga pyarrow)
+INPUT_CACHE_MAX_MB = 500  # maks. rozmiar pamięci podręcznej plików wejściowych; najdawniej używane pliki są usuwane
+GEOPORTAL_CACHE_ENABLED = True  # zapis pobranych wysokości w katalogu pamięci podręcznej użytkownika i ich ponowne użycie
+GEOPORTAL_CACHE_MAX_AGE_DAYS = 90  # po tylu dniach wysokość jest pobierana ponownie (aktualizacje NMT), 0 = bez wygasania
 ROUND_INPUT_DECIMALS = 1  # domyślna liczba miejsc po przecinku do zaokrąglania
 DEFAULT_SPARSE_GRID_DISTANCE = 25.0  # domyślna odległość siatki rozrzedzonej (m)
+AFFINE_TRANSFORM_TOLERANCE = 0.001  # maks. błąd przybliżenia afinicznego transformacji (m), 0 = zawsze PROJ
 # ====================================================================== 
\ No newline at end of file
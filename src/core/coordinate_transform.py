@@ -4,16 +4,19 @@
 Moduł transformacji współrzędnych geodezyjnych
 """
 
+import os
 import logging
-import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
 import pandas as pd
-# --- ZMIANA: Dodajemy import `cast` ---
-from typing import List, Optional, Tuple, Dict, Any, cast
+from typing import TYPE_CHECKING, Optional, Tuple, Dict, Any
 from tqdm import tqdm
-from pyproj import Transformer
-from pyproj.exceptions import CRSError
-from .data_loader import get_source_epsg
+from .data_loader import get_source_epsg_array
+from ..config.settings import AFFINE_TRANSFORM_TOLERANCE
+
+if TYPE_CHECKING:
+    from pyproj import Transformer
 
 # Import CUDA transform functions
 try:
@@ -26,101 +29,226 @@ try:
     logging.info("Moduł transformacji CUDA załadowany pomyślnie.")
 except ImportError:
     def check_cuda_availability() -> bool: return False
-    def transform_coordinates_cuda_optimized(df: pd.DataFrame) -> Optional[List[Optional[Tuple[float, float]]]]: return None
+    def transform_coordinates_cuda_optimized(df: pd.DataFrame) -> Optional[np.ndarray]: return None
     def get_cuda_device_info() -> Optional[Dict[str, Any]]: return None
     CUDA_MODULE_AVAILABLE = False
     logging.info("Moduł CUDA nie jest dostępny. Funkcje CUDA będą nieaktywne.")
 
 
-def transform_chunk_cpu(chunk_data: Tuple[int, pd.DataFrame]) -> Tuple[pd.Index, np.ndarray]:
+@lru_cache(maxsize=16)
+def _get_transformer(src_epsg: int, dst_epsg: int = 2180) -> "Transformer":
     """
-    Worker do równoległej transformacji partii (chunk) danych dla jednej strefy EPSG.
-    
-    Args:
-        chunk_data (Tuple[int, pd.DataFrame]): Krotka zawierająca (source_epsg, DataFrame z punktami).
-    
+    Zwraca transformator pyproj dla pary układów. Budowa transformatora jest
+    kosztowna, więc każda para jest tworzona raz na proces.
+    """
+    # pyproj (baza PROJ) ładowany dopiero przy pierwszej transformacji
+    from pyproj import Transformer
+
+    return Transformer.from_crs(f"EPSG:{src_epsg}", f"EPSG:{dst_epsg}", always_xy=True)
+
+
+# Poniżej tej liczby punktów PROJ jest wystarczająco szybki i dopasowanie się nie opłaca
+AFFINE_MIN_POINTS = 10_000
+# Zakres (bbox) zaokrąglany na zewnątrz do tej wielkości (m), aby dopasowanie można było cache'ować
+AFFINE_BBOX_STEP = 10.0
+
+
+@lru_cache(maxsize=64)
+def _fit_affine(
+    src_epsg: int, e_min: float, n_min: float, e_max: float, n_max: float
+) -> Optional[np.ndarray]:
+    """
+    Dopasowuje model afiniczny transformacji PL-2000 -> PL-1992 dla prostokąta
+    (e_min, n_min, e_max, n_max). Transformacja w obrębie strefy jest gładka,
+    więc na małym obszarze model afiniczny jest praktycznie dokładny.
+    Model jest dopasowywany na siatce 5x5 punktów i sprawdzany w środkach jej oczek.
     Returns:
-        Tuple[pd.Index, np.ndarray]: Krotka zawierająca (oryginalne indeksy, przetransformowane punkty).
+        Optional[np.ndarray]: Współczynniki (3, 2) dla [e - e_min, n - n_min, 1]
+                              lub None, jeśli błąd przekracza AFFINE_TRANSFORM_TOLERANCE.
     """
-    source_epsg, chunk_df = chunk_data
-    
-    if chunk_df.empty:
-        return chunk_df.index, np.array([])
-        
-    try:
-        transformer = Transformer.from_crs(
-            f"EPSG:{source_epsg}", "EPSG:2180", always_xy=True
+    transformer = _get_transformer(src_epsg)
+    fit_e, fit_n = np.meshgrid(np.linspace(e_min, e_max, 5), np.linspace(n_min, n_max, 5))
+    check_e, check_n = np.meshgrid(
+        np.linspace(e_min, e_max, 9)[1::2], np.linspace(n_min, n_max, 9)[1::2]
+    )
+    sample_e = np.concatenate([fit_e.ravel(), check_e.ravel()])
+    sample_n = np.concatenate([fit_n.ravel(), check_n.ravel()])
+    x_out, y_out = transformer.transform(sample_e, sample_n)
+    design = np.column_stack([sample_e - e_min, sample_n - n_min, np.ones_like(sample_e)])
+    target = np.column_stack([x_out, y_out])
+    n_fit = fit_e.size
+    coefficients = np.linalg.lstsq(design[:n_fit], target[:n_fit], rcond=None)[0]
+    max_error = np.hypot(*(design @ coefficients - target).T).max()
+    if not np.isfinite(max_error) or max_error > AFFINE_TRANSFORM_TOLERANCE:
+        logging.debug(
+            f"Przybliżenie afiniczne odrzucone (EPSG:{src_epsg}, błąd {max_error:.4f} m)."
+        )
+        return None
+    logging.debug(f"Przybliżenie afiniczne dla EPSG:{src_epsg}, maks. błąd {max_error:.6f} m.")
+    return coefficients
+
+
+def _transform_affine(
+    source_epsg: int, eastings: np.ndarray, northings: np.ndarray
+) -> Optional[np.ndarray]:
+    """
+    Transformuje punkty modelem afinicznym, jeśli obszar jest na tyle mały,
+    że błąd przybliżenia mieści się w tolerancji. W przeciwnym razie zwraca None.
+    """
+    if AFFINE_TRANSFORM_TOLERANCE <= 0 or len(eastings) < AFFINE_MIN_POINTS:
+        return None
+    if not (np.isfinite(eastings).all() and np.isfinite(northings).all()):
+        return None
+    step = AFFINE_BBOX_STEP
+    e_min = float(np.floor(eastings.min() / step) * step)
+    n_min = float(np.floor(northings.min() / step) * step)
+    e_max = float(np.ceil(eastings.max() / step) * step)
+    n_max = float(np.ceil(northings.max() / step) * step)
+    coefficients = _fit_affine(source_epsg, e_min, n_min, e_max, n_max)
+    if coefficients is None:
+        return None
+    de, dn = eastings - e_min, northings - n_min
+    return np.column_stack(
+        (
+            de * coefficients[0, 0] + dn * coefficients[1, 0] + coefficients[2, 0],
+            de * coefficients[0, 1] + dn * coefficients[1, 1] + coefficients[2, 1],
         )
-        x_out, y_out = transformer.transform(
-            chunk_df["geodetic_easting"].values, chunk_df["geodetic_northing"].values
+    )
+
+
+# Od tej liczby punktów transformacja PROJ jest dzielona na wątki
+THREADED_TRANSFORM_MIN_POINTS = 2_000_000
+
+
+def _transform_proj(
+    source_epsg: int, eastings: np.ndarray, northings: np.ndarray
+) -> np.ndarray:
+    """
+    Transformuje punkty przez PROJ. Duże zbiory są dzielone na części
+    przetwarzane w wątkach - pyproj zwalnia GIL na czas obliczeń, a każdy
+    wątek korzysta z własnego kontekstu PROJ.
+    """
+    transformer = _get_transformer(source_epsg)
+    workers = min(os.cpu_count() or 1, 8)
+    if len(eastings) < THREADED_TRANSFORM_MIN_POINTS or workers < 2:
+        x_out, y_out = transformer.transform(eastings, northings)
+        return np.column_stack((x_out, y_out))
+
+    bounds = np.linspace(0, len(eastings), workers + 1).astype(int)
+    slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(
+            executor.map(
+                lambda part: transformer.transform(eastings[part], northings[part]),
+                slices,
+            )
         )
-        return chunk_df.index, np.vstack((x_out, y_out)).T
+    return np.column_stack(
+        (np.concatenate([x for x, _ in parts]), np.concatenate([y for _, y in parts]))
+    )
+
+
+def transform_chunk_cpu(
+    chunk_data: Tuple[int, np.ndarray, np.ndarray, np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Transformuje wszystkie punkty jednej strefy EPSG jednym wywołaniem PROJ.
+
+    Args:
+        chunk_data (Tuple[int, np.ndarray, np.ndarray, np.ndarray]): Krotka zawierająca
+            (source_epsg, pozycje punktów, eastingi, northingi).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Krotka zawierająca (pozycje punktów, przetransformowane punkty).
+    """
+    from pyproj.exceptions import CRSError
+
+    source_epsg, positions, eastings, northings = chunk_data
+
+    if len(positions) == 0:
+        return positions, np.empty((0, 2))
+
+    try:
+        approximated = _transform_affine(int(source_epsg), eastings, northings)
+        if approximated is not None:
+            return positions, approximated
+        return positions, _transform_proj(int(source_epsg), eastings, northings)
     except CRSError as e:
         logging.error(f"BŁĄD KRYTYCZNY: Nie można utworzyć transformera dla EPSG:{source_epsg}. Błąd: {e}")
-        return chunk_df.index, np.full((len(chunk_df), 2), np.nan)
+        return positions, np.full((len(positions), 2), np.nan)
 
 
-def transform_coordinates_parallel(
-    df: pd.DataFrame,
-) -> List[Optional[Tuple[float, float]]]:
+def transform_coordinates_parallel(df: pd.DataFrame) -> np.ndarray:
     """
     Funkcja do równoległej transformacji współrzędnych geodezyjnych z układu PL-2000 do układu PL-1992 (EPSG:2180).
+
+    Returns:
+        np.ndarray: Tablica (N, 2) z kolumnami (easting, northing) w EPSG:2180,
+                    w kolejności wierszy `df`. Punkty, których nie udało się
+                    przetransformować, mają wartości NaN.
     """
     from colorama import Fore, Style
-    
+
     if df.empty:
-        return []
+        return np.empty((0, 2))
 
     # Sprawdź dostępność CUDA
     if CUDA_MODULE_AVAILABLE and check_cuda_availability():
         print(f"{Fore.GREEN}Wykryto kartę NVIDIA - używam przyspieszenia CUDA{Style.RESET_ALL}")
         logging.info("Używam transformacji CUDA")
-        
+
         try:
             result = transform_coordinates_cuda_optimized(df)
             if result is not None:
                 return result
         except Exception as e:
             logging.warning(f"Błąd w zoptymalizowanej transformacji CUDA: {e}. Przełączam na CPU.")
-    
+
     # === ZOPTYMALIZOWANY TRYB CPU ===
     print(f"{Fore.YELLOW}Używam zoptymalizowanego przetwarzania CPU (CUDA niedostępne lub wystąpił błąd){Style.RESET_ALL}")
     logging.info("Używam zoptymalizowanej, wsadowej transformacji CPU")
     print(f"\n{Fore.CYAN}Transformuję współrzędne ...{Style.RESET_ALL}")
-    
-    df_copy = df.copy()
-    df_copy['source_epsg'] = df_copy['geodetic_easting'].apply(get_source_epsg)
-    
-    grouped = df_copy.groupby('source_epsg')
-    
-    # --- ZMIANA: Używamy `cast` do poinformowania Pylance o poprawnym typie ---
-    tasks = [
-        (cast(int, epsg), group_df)
-        for epsg, group_df in grouped
-        if epsg is not None and pd.notna(epsg)
-    ]
-
-    results_list: List[Optional[Tuple[float, float]]] = [None] * len(df)
-    original_indices = df.index
-    index_to_pos = {idx: pos for pos, idx in enumerate(original_indices)}
-
-    with multiprocessing.Pool() as pool:
-        results_iterator = pool.imap_unordered(transform_chunk_cpu, tasks)
-        
-        for chunk_indices, transformed_points_chunk in tqdm(results_iterator, total=len(tasks), desc="Transformacja stref (CPU)"):
-            for i, original_idx in enumerate(chunk_indices):
-                list_pos = index_to_pos.get(original_idx)
-                if list_pos is None:
-                    continue
-                    
-                point = transformed_points_chunk[i]
-                if not np.isnan(point).any():
-                    results_list[list_pos] = (point[0], point[1])
-                else:
-                    results_list[list_pos] = None
-                    
+
+    # Strefa EPSG dla całej kolumny naraz
+    source_epsg = get_source_epsg_array(df["geodetic_easting"])
+
+    eastings = df["geodetic_easting"].to_numpy(dtype=np.float64)
+    northings = df["geodetic_northing"].to_numpy(dtype=np.float64)
+
+    # Najczęstszy przypadek: cały plik w jednej strefie. Wtedy wystarczy jedno
+    # wywołanie PROJ w bieżącym procesie, bez uruchamiania puli procesów.
+    unique_zones = np.unique(source_epsg)
+    if len(unique_zones) == 1 and unique_zones[0] > 0:
+        logging.debug(f"Wszystkie punkty w strefie EPSG:{unique_zones[0]} - pojedyncza transformacja.")
+        _, results = transform_chunk_cpu(
+            (int(unique_zones[0]), np.arange(len(df)), eastings, northings)
+        )
+        logging.debug(f"Zakończono transformację CPU. Przetworzono {len(df)} punktów.")
+        return results
+
+    tasks = []
+    for epsg in unique_zones[unique_zones > 0]:
+        group_positions = np.flatnonzero(source_epsg == epsg)
+        tasks.append(
+            (int(epsg), group_positions, eastings[group_positions], northings[group_positions])
+        )
+
+    results = np.full((len(df), 2), np.nan)
+
+    # Każda strefa to jedno wsadowe wywołanie PROJ. Strefy są przetwarzane w wątkach:
+    # pyproj zwalnia GIL na czas transformacji tablic, a wątki (w przeciwieństwie
+    # do puli procesów) nie wymagają serializacji tablic
+    workers = max(1, min(len(tasks), os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk_positions, transformed_points_chunk in tqdm(
+            executor.map(transform_chunk_cpu, tasks),
+            total=len(tasks),
+            desc="Transformacja stref (CPU)",
+        ):
+            results[chunk_positions] = transformed_points_chunk
+
     logging.debug(f"Zakończono transformację CPU. Przetworzono {len(df)} punktów.")
-    return results_list
+    return results
 
 
 def get_transformation_method_info() -> str:
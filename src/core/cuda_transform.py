@@ -7,9 +7,7 @@ import numpy as np
 import pandas as pd
 from typing import List, Optional, Tuple
 from tqdm import tqdm
-from pyproj import Transformer
-from pyproj.exceptions import CRSError
-from .data_loader import get_source_epsg
+from .data_loader import get_source_epsg_array
 
 try:
     import cupy as cp
@@ -20,6 +18,13 @@ except ImportError:
     CUDA_AVAILABLE = False
     logging.info("CuPy nie jest dostępne - używam przetwarzania CPU")
 
+try:
+    from cuproj.transformer import Transformer as CuTransformer
+    CUPROJ_AVAILABLE = True
+except ImportError:
+    CuTransformer = None
+    CUPROJ_AVAILABLE = False
+
 
 def check_cuda_availability() -> bool:
     """
@@ -123,31 +128,91 @@ def get_epsg_zones_for_batch(eastings: np.ndarray) -> np.ndarray:
     """
     Określa strefy EPSG dla partii współrzędnych easting
     """
-    epsg_zones = np.zeros(len(eastings), dtype=np.int32)
-    
-    for i, easting in enumerate(eastings):
-        epsg_zone = get_source_epsg(easting)
-        if epsg_zone is not None:
-            epsg_zones[i] = epsg_zone
-        else:
-            epsg_zones[i] = -1  # Oznaczenie błędu
-    
-    return epsg_zones
+    epsg_zones = get_source_epsg_array(eastings)
+    # -1 oznacza błąd (brak strefy)
+    return np.where(epsg_zones > 0, epsg_zones, -1).astype(np.int32)
+
 
+# Maksymalna dopuszczalna różnica między cuProj a pyproj w punktach kontrolnych (m)
+CUPROJ_TOLERANCE = 0.001
 
-def create_transformers_for_zones(unique_epsg_zones: List[int]) -> dict:
+
+def _sample_points(src_epsg: int) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Tworzy transformery dla unikalnych stref EPSG
+    Zwraca siatkę 3x3 punktów kontrolnych (easting, northing) w układzie src_epsg,
+    rozmieszczonych wewnątrz obszaru stosowania układu.
     """
+    from pyproj import CRS
+    from .coordinate_transform import _get_transformer
+
+    area = CRS.from_epsg(src_epsg).area_of_use
+    lon, lat = np.meshgrid(
+        np.linspace(area.west, area.east, 5)[1:4], np.linspace(area.south, area.north, 5)[1:4]
+    )
+    eastings, northings = _get_transformer(4326, src_epsg).transform(lon.ravel(), lat.ravel())
+    return np.asarray(eastings), np.asarray(northings)
+
+
+def _get_gpu_transformer(src_epsg: int, dst_epsg: int = 2180):
+    """
+    Zwraca transformator cuProj dla pary układów, jeśli cuProj jest dostępne, obsługuje
+    daną parę EPSG i jego wyniki w punktach kontrolnych zgadzają się z pyproj
+    (do CUPROJ_TOLERANCE). W przeciwnym razie zwraca transformator pyproj
+    z coordinate_transform._get_transformer.
+    """
+    from .coordinate_transform import _get_transformer
+
+    transformer = _get_transformer(src_epsg, dst_epsg)
+    if not CUPROJ_AVAILABLE or CuTransformer is None or cp is None:
+        return transformer
+    try:
+        gpu_transformer = CuTransformer.from_crs(f"EPSG:{src_epsg}", f"EPSG:{dst_epsg}")
+        eastings, northings = _sample_points(src_epsg)
+        x_gpu, y_gpu = _transform_batch(gpu_transformer, eastings, northings)
+        x_cpu, y_cpu = transformer.transform(eastings, northings)
+        error = max(np.max(np.abs(x_gpu - x_cpu)), np.max(np.abs(y_gpu - y_cpu)))
+    except Exception as e:
+        # cuProj obsługuje ograniczony zestaw układów (m.in. WGS84 <-> UTM)
+        logging.debug(f"cuProj nie obsługuje EPSG:{src_epsg} -> EPSG:{dst_epsg}: {e}")
+        return transformer
+    if not error <= CUPROJ_TOLERANCE:
+        logging.warning(
+            f"Wyniki cuProj dla EPSG:{src_epsg} -> EPSG:{dst_epsg} różnią się od pyproj "
+            f"(maks. {error:.4f} m) - używam pyproj."
+        )
+        return transformer
+    logging.info(f"Transformacja EPSG:{src_epsg} -> EPSG:{dst_epsg} będzie wykonywana przez cuProj.")
+    return gpu_transformer
+
+
+def _transform_batch(transformer, eastings: np.ndarray, northings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Transformuje partię punktów i zwraca (easting, northing) w układzie docelowym.
+    Transformator cuProj pracuje na tablicach GPU w kolejności osi z definicji
+    układu (dla PL-2000 i PL-1992: northing, easting).
+    """
+    if CuTransformer is not None and isinstance(transformer, CuTransformer):
+        y_out, x_out = transformer.transform(cp.asarray(northings), cp.asarray(eastings))
+        return cp.asnumpy(x_out), cp.asnumpy(y_out)
+    return transformer.transform(eastings, northings)
+
+
+def create_transformers_for_zones(unique_epsg_zones: List[int], use_gpu: bool = True) -> dict:
+    """
+    Tworzy transformery dla unikalnych stref EPSG. Przy use_gpu=False zawsze
+    zwracane są transformatory pyproj (np. dla transformacji punkt po punkcie).
+    """
+    from pyproj.exceptions import CRSError
+    from .coordinate_transform import _get_transformer
+
+    factory = _get_gpu_transformer if use_gpu else _get_transformer
+
     transformers = {}
     
     for epsg_zone in unique_epsg_zones:
         if epsg_zone > 0:
             try:
-                transformer = Transformer.from_crs(
-                    f"EPSG:{epsg_zone}", "EPSG:2180", always_xy=True
-                )
-                transformers[epsg_zone] = transformer
+                transformers[epsg_zone] = factory(int(epsg_zone))
             except CRSError as e:
                 logging.warning(f"Błąd tworzenia transformera dla EPSG:{epsg_zone}: {e}")
     
@@ -202,7 +267,8 @@ def transform_coordinates_cuda(
         unique_zones = list(set(epsg_zones[epsg_zones > 0]))
         
         # Tworzenie transformerów dla unikalnych stref
-        transformers = create_transformers_for_zones(unique_zones)
+        # Transformacja punkt po punkcie - cuProj oznaczałby kopiowanie na GPU dla każdego punktu
+        transformers = create_transformers_for_zones(unique_zones, use_gpu=False)
         
         # Transformacja dla każdego punktu w partii
         batch_results = []
@@ -234,9 +300,10 @@ def transform_coordinates_cuda(
 
 def transform_coordinates_cuda_optimized(
     df: pd.DataFrame
-) -> Optional[List[Optional[Tuple[float, float]]]]:
+) -> Optional[np.ndarray]:
     """
-    Zoptymalizowana wersja transformacji CUDA z lepszym wykorzystaniem pamięci GPU
+    Zoptymalizowana wersja transformacji CUDA z lepszym wykorzystaniem pamięci GPU.
+    Zwraca tablicę (N, 2) z kolumnami (easting, northing); NaN dla błędów.
     """
     from colorama import Fore, Style
     
@@ -274,7 +341,7 @@ def transform_coordinates_cuda_optimized(
             zone_groups[epsg_zone].append(i)
     
     # Transformacja dla każdej strefy
-    results: List[Optional[Tuple[float, float]]] = [None] * len(df)
+    results = np.full((len(df), 2), np.nan)
     
     for epsg_zone, indices in tqdm(zone_groups.items(), desc="Transformacja stref CUDA"):
         transformer = transformers[epsg_zone]
@@ -290,12 +357,12 @@ def transform_coordinates_cuda_optimized(
             
             try:
                 # Transformacja partii
-                x_out, y_out = transformer.transform(batch_eastings, batch_northings)
+                x_out, y_out = _transform_batch(transformer, batch_eastings, batch_northings)
                 
                 # Zapisanie wyników
-                for j, (x, y) in enumerate(zip(x_out, y_out)):
-                    original_idx = indices[i + j]
-                    results[original_idx] = (x, y)
+                batch_indices = indices[i:batch_end]
+                results[batch_indices, 0] = x_out
+                results[batch_indices, 1] = y_out
                     
             except Exception as e:
                 logging.warning(f"Błąd transformacji dla strefy EPSG:{epsg_zone}: {e}")
@@ -303,11 +370,10 @@ def transform_coordinates_cuda_optimized(
                 for j in range(i, batch_end):
                     original_idx = indices[j]
                     try:
-                        x, y = transformer.transform(zone_eastings[j], zone_northings[j])
-                        results[original_idx] = (x, y)
+                        x, y = _transform_batch(transformer, zone_eastings[j:j + 1], zone_northings[j:j + 1])
+                        results[original_idx] = (x[0], y[0])
                     except Exception as e2:
                         logging.debug(f"Błąd transformacji punktu {original_idx + 1}: {e2}")
-                        results[original_idx] = None
     
     logging.debug(f"Zakończono zoptymalizowaną transformację CUDA. Przetworzono {len(results)} punktów.")
     return results 
\ No newline at end of file
@@ -2,11 +2,134 @@
 Moduł wczytywania danych z plików
 """
 
+import io
 import os
 import logging
+import hashlib
+import importlib.util
+import numpy as np
 import pandas as pd
 from typing import Optional
 from colorama import Fore, Style
+from ..config.settings import DEBUG_MODE, INPUT_CACHE_ENABLED, INPUT_CACHE_MAX_MB
+from ..utils.cache_dir import get_user_cache_dir
+
+
+# Liczba wierszy wczytywanych jednorazowo z pliku tekstowego
+CSV_CHUNK_SIZE = 200_000
+
+# Wielowątkowy parser pyarrow jest opcjonalny (sprawdzamy bez importowania)
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+# Szybki czytnik Excela (python-calamine, w Rust) jest opcjonalny
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+
+# Katalog z przetworzonymi plikami wejściowymi (Parquet) w pamięci podręcznej użytkownika
+INPUT_CACHE_DIR = get_user_cache_dir("input")
+
+
+# Obsługiwane separatory, w kolejności sprawdzania
+SEPARATORS = [";", ",", r"\s+"]
+# Rozmiar początku pliku, na podstawie którego wykrywany jest separator
+SNIFF_BYTES = 8192
+
+
+def sniff_separators(file_path: str) -> list:
+    """
+    Ustala kolejność separatorów do wczytania pliku na podstawie jego początku
+    (SNIFF_BYTES). Pierwszy separator, który dzieli próbkę na co najmniej 2 niepuste
+    kolumny, trafia na początek listy, dzięki czemu cały plik jest zwykle
+    parsowany tylko raz.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return list(SEPARATORS)
+    if len(head) == SNIFF_BYTES and b"\n" in head:
+        # Pomijamy ostatnią, niepełną linię próbki
+        head = head[: head.rfind(b"\n") + 1]
+    sample = head.decode("utf-8", errors="replace")
+    for sep in SEPARATORS:
+        try:
+            sample_df = pd.read_csv(
+                io.StringIO(sample),
+                sep=sep,
+                header=None,
+                on_bad_lines="skip",
+                engine="c",
+                dtype=str,
+            ).dropna(how="all", axis=1)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
+            continue
+        if len(sample_df.columns) >= 2:
+            logging.debug(f"Wykryto separator '{sep}' na podstawie początku pliku.")
+            return [sep] + [other for other in SEPARATORS if other != sep]
+    return list(SEPARATORS)
+
+
+def parse_float_column(column: pd.Series) -> pd.Series:
+    """
+    Konwertuje kolumnę tekstową na float64. Najpierw próbuje bezpośredniej
+    konwersji (jedno przejście w C); jeśli kolumna zawiera przecinki dziesiętne
+    lub wartości nienumeryczne, zamienia ',' na '.', a błędne wartości na NaN.
+    """
+    try:
+        return column.astype(np.float64)
+    except (ValueError, TypeError):
+        return pd.to_numeric(column.astype(str).str.replace(",", "."), errors="coerce")
+
+
+def read_delimited(file_path: str, sep: str) -> Optional[pd.DataFrame]:
+    """
+    Wczytuje plik tekstowy z podanym separatorem porcjami po CSV_CHUNK_SIZE wierszy.
+    Liczba kolumn jest ustalana z pierwszej linii, więc jeśli już pierwsza porcja
+    ma mniej niż 2 kolumny, separator jest błędny i reszta pliku nie jest czytana.
+    Jeśli zainstalowany jest pyarrow, pliki z separatorem jednoznakowym są
+    czytane jego wielowątkowym parserem (w razie błędu - parserem C).
+    Pyarrow pomija wiersze o innej liczbie pól, a parser C uzupełnia krótsze
+    wiersze pustymi wartościami, dlatego plik z takim wierszem jest zawsze
+    czytany parserem C - wynik nie zależy od tego, czy pyarrow jest zainstalowany.
+    Returns:
+        Optional[pd.DataFrame]: Dane jako tekst (bez pustych kolumn) lub None dla złego separatora.
+    """
+    if PYARROW_AVAILABLE and len(sep) == 1:
+        try:
+            df = pd.read_csv(
+                file_path,
+                sep=sep,
+                header=None,
+                on_bad_lines="error",
+                engine="pyarrow",
+                dtype=str,
+            )
+            if len(df.columns) < 2:
+                return None
+            return df.dropna(how="all", axis=1)
+        except Exception as e:
+            logging.debug(f"Parser pyarrow nie wczytał pliku ({e}), używam parsera C.")
+
+    reader = pd.read_csv(
+        file_path,
+        sep=sep,
+        header=None,
+        on_bad_lines="skip",
+        engine="c",
+        memory_map=True,
+        dtype=str,
+        chunksize=CSV_CHUNK_SIZE,
+    )
+    with reader:
+        chunks = []
+        for chunk in reader:
+            if not chunks and len(chunk.columns) < 2:
+                return None
+            chunks.append(chunk)
+    if not chunks:
+        return None
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return df.dropna(how="all", axis=1)
 
 
 def load_scope_data(file_path: str, swap_xy: bool = False) -> Optional[pd.DataFrame]:
@@ -23,21 +146,14 @@ def load_scope_data(file_path: str, swap_xy: bool = False) -> Optional[pd.DataFr
     try:
         file_ext = os.path.splitext(file_path)[1].lower()
         if file_ext in [".xls", ".xlsx"]:
-            df = pd.read_excel(file_path, header=None, dtype=str)
+            df = read_excel_sheet(file_path)
         else:
             # Próba wczytania z różnymi separatorami
-            for sep in [";", ",", r"\s+"]:
+            for sep in sniff_separators(file_path):
                 # Używamy try-except, aby uniknąć błędów przy parsowaniu
                 try:
-                    temp_df = pd.read_csv(
-                        file_path,
-                        sep=sep,
-                        header=None,
-                        on_bad_lines="skip",
-                        engine="python",
-                        dtype=str,
-                    ).dropna(how="all", axis=1)
-                    if len(temp_df.columns) in [2, 3]:
+                    temp_df = read_delimited(file_path, sep)
+                    if temp_df is not None and len(temp_df.columns) in [2, 3]:
                         df = temp_df
                         sep_display = "spacja/tab" if sep == r"\s+" else sep
                         print(
@@ -106,9 +222,7 @@ def load_scope_data(file_path: str, swap_xy: bool = False) -> Optional[pd.DataFr
 
         # Walidacja numeryczności kolumn X i Y
         for col in ["x", "y"]:
-            df[col] = pd.to_numeric(
-                df[col].astype(str).str.replace(",", "."), errors="coerce"
-            )
+            df[col] = parse_float_column(df[col])
 
         if df[["x", "y"]].isnull().values.any():
             print(
@@ -134,6 +248,118 @@ def load_scope_data(file_path: str, swap_xy: bool = False) -> Optional[pd.DataFr
         return None
 
 
+def read_excel_sheet(file_path: str) -> pd.DataFrame:
+    """
+    Wczytuje pierwszy arkusz pliku XLS/XLSX jako tekst. Jeśli zainstalowany jest
+    python-calamine, używany jest jego czytnik (wielokrotnie szybszy od openpyxl);
+    w przeciwnym razie domyślny silnik pandas.
+    """
+    if CALAMINE_AVAILABLE:
+        try:
+            return pd.read_excel(file_path, header=None, dtype=str, engine="calamine")
+        except (ImportError, ValueError) as e:
+            # np. pandas < 2.2, który nie zna silnika calamine
+            logging.debug(f"Czytnik calamine niedostępny ({e}), używam domyślnego silnika.")
+    return pd.read_excel(file_path, header=None, dtype=str)
+
+
+def file_digest(file_path: str) -> str:
+    """ Zwraca skrót (BLAKE2b) zawartości pliku, czytanego blokami po 1 MB. """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def input_cache_path(
+    file_path: str, swap_xy: bool, expect_height_column: bool
+) -> Optional[str]:
+    """
+    Zwraca ścieżkę pliku Parquet z przetworzonymi danymi dla danego pliku wejściowego
+    i opcji wczytywania, lub None, jeśli pamięć podręczna jest niedostępna
+    (wyłączona w ustawieniach lub brak pyarrow).
+    Klucz tworzą skrót zawartości i rozmiar pliku (a nie ścieżka i data modyfikacji),
+    więc zmieniony plik nigdy nie zostanie odczytany z nieaktualnej pamięci podręcznej.
+    """
+    if not (INPUT_CACHE_ENABLED and PYARROW_AVAILABLE):
+        return None
+    try:
+        key = f"{file_digest(file_path)}-{os.path.getsize(file_path)}"
+    except OSError:
+        return None
+    return os.path.join(
+        INPUT_CACHE_DIR, f"{key}-{int(swap_xy)}{int(expect_height_column)}.parquet"
+    )
+
+
+def read_input_cache(cache_path: Optional[str]) -> Optional[pd.DataFrame]:
+    """
+    Wczytuje przetworzone dane z pamięci podręcznej, jeśli plik Parquet istnieje.
+    W przeciwnym razie zwraca None. Odczytany plik jest oznaczany jako ostatnio
+    użyty (data modyfikacji), co uwzględnia prune_input_cache.
+    """
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+    try:
+        df = pd.read_parquet(cache_path, engine="pyarrow")
+    except Exception as e:
+        logging.warning(f"Nie udało się wczytać pamięci podręcznej {cache_path}: {e}")
+        return None
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return df
+
+
+def prune_input_cache(max_bytes: int):
+    """
+    Usuwa najdawniej używane pliki pamięci podręcznej, aż ich łączny rozmiar
+    nie przekracza max_bytes.
+    """
+    try:
+        entries = []
+        for entry in os.scandir(INPUT_CACHE_DIR):
+            if entry.is_file() and entry.name.endswith(".parquet"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            logging.debug(f"Usunięto z pamięci podręcznej: {path}")
+        except OSError as e:
+            logging.debug(f"Nie udało się usunąć {path}: {e}")
+
+
+def write_input_cache(df: pd.DataFrame, cache_path: Optional[str]):
+    """
+    Zapisuje przetworzone dane do pamięci podręcznej (Parquet, kompresja zstd)
+    i ogranicza jej rozmiar do INPUT_CACHE_MAX_MB. Plik jest zapisywany pod
+    nazwą tymczasową i podmieniany, aby nie odczytać go w połowie zapisu.
+    """
+    if cache_path is None:
+        return
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(INPUT_CACHE_DIR, exist_ok=True)
+        df.to_parquet(temp_path, engine="pyarrow", compression="zstd")
+        os.replace(temp_path, cache_path)
+        logging.debug(f"Zapisano przetworzone dane w pamięci podręcznej: {cache_path}")
+    except Exception as e:
+        logging.warning(f"Nie udało się zapisać pamięci podręcznej {cache_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+    prune_input_cache(INPUT_CACHE_MAX_MB * 1024 * 1024)
+
+
 def load_data(
     file_path: str, swap_xy: bool = False, expect_height_column: bool = True
 ) -> Optional[pd.DataFrame]:
@@ -151,26 +377,28 @@ def load_data(
     logging.debug(
         f"Rozpoczęto wczytywanie pliku: {file_path}, swap_xy={swap_xy}, expect_height={expect_height_column}"
     )
-    df = None
+    # Plik wczytany już wcześniej z tymi samymi opcjami i od tego czasu niezmieniony
+    cache_path = input_cache_path(file_path, swap_xy, expect_height_column)
+    df = read_input_cache(cache_path)
+    if df is not None:
+        print(f"{Fore.GREEN}Wczytano {len(df)} wierszy (z pamięci podręcznej).")
+        logging.debug(f"Wczytano dane z pamięci podręcznej: {cache_path}")
+        return df
+
+    # Dane z autonumeracją zależą od podanego prefiksu, więc nie są zapamiętywane
+    autonumbered = False
     try:
         # 1. Wczytanie surowych danych (logika wspólna)
         file_ext = os.path.splitext(file_path)[1].lower()
         if file_ext in [".xls", ".xlsx"]:
-            df = pd.read_excel(file_path, header=None, dtype=str).dropna(
-                how="all", axis=1
-            )
+            df = read_excel_sheet(file_path).dropna(how="all", axis=1)
         else:
-            for sep in [";", ",", r"\s+"]:
-                temp_df = pd.read_csv(
-                    file_path,
-                    sep=sep,
-                    header=None,
-                    on_bad_lines="skip",
-                    engine="python",
-                    dtype=str,
-                ).dropna(how="all", axis=1)
+            # Parser C obsługuje również separator białych znaków (\s+),
+            # więc nie ma potrzeby przechodzenia na wolniejszy engine="python"
+            for sep in sniff_separators(file_path):
+                temp_df = read_delimited(file_path, sep)
                 # Sprawdzamy, czy w ogóle mamy jakieś kolumny do pracy
-                if len(temp_df.columns) >= 2:
+                if temp_df is not None and len(temp_df.columns) >= 2:
                     df = temp_df
                     sep_display = "spacja/tab" if sep == r"\s+" else sep
                     print(
@@ -221,6 +449,7 @@ def load_data(
                 )
                 df.columns = ["x", "y", "h"]
                 df.insert(0, "id", [f"{prefix}_{i + 1}" for i in range(len(df))])
+                autonumbered = True
             else:
                 print(
                     f"{Fore.RED}Błąd: Plik musi mieć 3 lub 4 kolumny (wykryto: {num_cols})."
@@ -246,6 +475,7 @@ def load_data(
                 )
                 df.columns = ["x", "y"]
                 df.insert(0, "id", [f"{prefix}_{i + 1}" for i in range(len(df))])
+                autonumbered = True
             else:
                 print(
                     f"{Fore.RED}Błąd: Plik musi mieć 2 lub 3 kolumny (wykryto: {num_cols})."
@@ -259,9 +489,7 @@ def load_data(
             logging.debug("Zamieniono kolumny X i Y.")
 
         for col in cols_to_process:
-            df[col] = pd.to_numeric(
-                df[col].astype(str).str.replace(",", "."), errors="coerce"
-            )
+            df[col] = parse_float_column(df[col])
 
         # Sprawdzenie, czy po konwersji nie ma pustych wartości w kluczowych kolumnach
         if df[cols_to_process].isnull().values.any():
@@ -271,7 +499,9 @@ def load_data(
             logging.error("Plik zawiera nienumeryczne wartości po konwersji.")
             return None
 
-        df.dropna(subset=cols_to_process, inplace=True)
+        df = optimize_memory(df)
+        if not autonumbered:
+            write_input_cache(df, cache_path)
         print(f"Wczytano {len(df)} wierszy.")
         logging.debug(f"Pomyślnie wczytano i przetworzono {len(df)} wierszy.")
         return df
@@ -284,25 +514,34 @@ def load_data(
         return None
 
 
-def has_easting_structure(coord: float) -> bool:
+def optimize_memory(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Sprawdza, czy współrzędna ma strukturę wschodniej (easting) w układzie PL-2000.
-    Args:
-        coord (float): Współrzędna do sprawdzenia.
-    Returns:
-        bool: True jeśli współrzędna ma strukturę wschodniej, False w przeciwnym razie.
+    Zmniejsza zużycie pamięci przez wczytane dane.
+    Współrzędne i wysokości pozostają w float64 - float32 ma tylko ~7 cyfr
+    znaczących, co przy współrzędnych PL-2000 (7 cyfr przed przecinkiem)
+    dawałoby rozdzielczość rzędu 0.5 m. Kolumna 'id' jest zamieniana na typ
+    'category', gdy identyfikatory często się powtarzają.
     """
-    try:
-        coord_str = str(int(coord))
-        return len(coord_str) == 7 and coord_str[0] in ["5", "6", "7", "8"]
-    except (ValueError, TypeError, IndexError):
-        return False
+    if DEBUG_MODE:
+        memory_before = df.memory_usage(deep=True).sum()
+
+    if "id" in df.columns and len(df) > 0 and df["id"].nunique() < len(df) / 2:
+        df["id"] = df["id"].astype("category")
+
+    if DEBUG_MODE:
+        memory_after = df.memory_usage(deep=True).sum()
+        logging.debug(
+            f"Pamięć danych: {memory_before / 1024:.1f} KiB -> {memory_after / 1024:.1f} KiB, typy: {df.dtypes.to_dict()}"
+        )
+    return df
 
 
 def assign_geodetic_roles(df: pd.DataFrame) -> pd.DataFrame:
     """
     Funkcja przypisuje kolumnom 'geodetic_northing' i 'geodetic_easting' odpowiednie wartości
     na podstawie struktury współrzędnych w DataFrame.
+    O kolejności osi decyduje cała kolumna (która z kolumn ma więcej wartości
+    o strukturze współrzędnej wschodniej), a nie tylko pierwszy wiersz.
     Args:
         df (pd.DataFrame): DataFrame z kolumnami 'x' i 'y'.
     Returns:
@@ -310,16 +549,27 @@ def assign_geodetic_roles(df: pd.DataFrame) -> pd.DataFrame:
     """
     if df.empty:
         return df
-    first_row = df.iloc[0]
-    if has_easting_structure(first_row["y"]):
-        df["geodetic_northing"], df["geodetic_easting"] = df["x"], df["y"]
-    elif has_easting_structure(first_row["x"]):
+    if get_easting_column(df) == "x":
         df["geodetic_northing"], df["geodetic_easting"] = df["y"], df["x"]
     else:
         df["geodetic_northing"], df["geodetic_easting"] = df["x"], df["y"]
     return df
 
 
+def get_easting_column(df: pd.DataFrame) -> str:
+    """
+    Zwraca nazwę kolumny ('x' lub 'y') zawierającej współrzędne wschodnie (easting),
+    tj. tej, w której więcej wartości ma strukturę współrzędnej wschodniej PL-2000.
+    Args:
+        df (pd.DataFrame): DataFrame z kolumnami 'x' i 'y'.
+    Returns:
+        str: 'x' lub 'y' (przy remisie 'y', zgodnie z konwencją geodezyjną).
+    """
+    y_eastings = np.count_nonzero(get_source_epsg_array(df["y"]))
+    x_eastings = np.count_nonzero(get_source_epsg_array(df["x"]))
+    return "x" if x_eastings > y_eastings else "y"
+
+
 def get_source_epsg(easting_coordinate: float) -> Optional[int]:
     """
     Funkcja do określenia strefy EPSG na podstawie współrzędnej wschodniej (easting).
@@ -329,9 +579,37 @@ def get_source_epsg(easting_coordinate: float) -> Optional[int]:
         Optional[int]: Kod EPSG strefy, lub None jeśli nie można określić.
     """
     try:
-        easting_str = str(int(easting_coordinate))
-        if len(easting_str) == 7:
-            return {"5": 2176, "6": 2177, "7": 2178, "8": 2179}.get(easting_str[0])
-    except (ValueError, TypeError, IndexError):
+        zone = int(easting_coordinate) // 1_000_000
+    except (ValueError, TypeError, OverflowError):
         return None
-    return None
+    return 2171 + zone if 5 <= zone <= 8 else None
+
+
+def detect_source_epsg(df: pd.DataFrame) -> Optional[int]:
+    """
+    Określa strefę EPSG pliku na podstawie współrzędnej wschodniej pierwszego punktu,
+    bez kopiowania ramki i przypisywania ról osi.
+    Args:
+        df (pd.DataFrame): DataFrame z kolumnami 'x' i 'y'.
+    Returns:
+        Optional[int]: Kod EPSG strefy, lub None jeśli nie można określić.
+    """
+    if df.empty:
+        return None
+    return get_source_epsg(df[get_easting_column(df)].iat[0])
+
+
+def get_source_epsg_array(easting_coordinates) -> np.ndarray:
+    """
+    Wektorowa wersja get_source_epsg dla całej kolumny współrzędnych wschodnich.
+    Współrzędna PL-2000 ma 7 cyfr, a pierwsza z nich to numer strefy (5-8),
+    więc wystarczy arytmetyka całkowitoliczbowa zamiast konwersji na tekst.
+    Args:
+        easting_coordinates: Tablica lub kolumna współrzędnych wschodnich.
+    Returns:
+        np.ndarray: Kody EPSG (2176-2179) lub 0 tam, gdzie nie można określić strefy.
+    """
+    values = np.asarray(easting_coordinates, dtype=np.float64)
+    values = np.where(np.isfinite(values), values, 0).astype(np.int64)
+    valid = (values >= 5_000_000) & (values < 9_000_000)
+    return np.where(valid, 2171 + values // 1_000_000, 0)
@@ -4,10 +4,78 @@ Moduł eksportu wyników do różnych formatów
 
 import os
 import logging
+import importlib.util
+import numpy as np
 import pandas as pd
-import geopandas as gpd
 from colorama import Fore, Style
-from .data_loader import assign_geodetic_roles, get_source_epsg
+from .data_loader import detect_source_epsg
+
+# Wielowątkowy zapis CSV przez Polars jest opcjonalny (sprawdzamy bez importowania)
+POLARS_AVAILABLE = importlib.util.find_spec("polars") is not None
+
+# pyogrio zapisuje całe kolumny jednym wywołaniem GDAL (Fiona - obiekt po obiekcie);
+# sprawdzane bez importu, bo geopandas jest ładowany dopiero przy eksporcie
+GPKG_ENGINE = "pyogrio" if importlib.util.find_spec("pyogrio") is not None else None
+
+
+def accuracy_mask(df: pd.DataFrame) -> pd.Series:
+    """
+    Zwraca maskę punktów spełniających warunek dokładności
+    (kolumna 'osiaga_dokladnosc'; brak wartości traktowany jak niespełnienie).
+    """
+    return df["osiaga_dokladnosc"].fillna(False).astype(bool)
+
+
+def format_accuracy_column(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Zamienia logiczną kolumnę 'osiaga_dokladnosc' na wartości 'Tak'/'Nie' do zapisu
+    w plikach wynikowych. Braki pozostają puste (w CSV jako 'brak_danych').
+    """
+    if "osiaga_dokladnosc" not in df.columns:
+        return df
+    return df.assign(
+        osiaga_dokladnosc=df["osiaga_dokladnosc"].map({True: "Tak", False: "Nie"})
+    )
+
+
+def polars_writes_like_pandas(df: pd.DataFrame) -> bool:
+    """
+    Sprawdza, czy Polars zapisze ramkę identycznie jak pandas.to_csv. Polars inaczej
+    formatuje wartości logiczne (true zamiast True) i liczby spoza zakresu
+    [1e-4, 1e16) (np. 0.00001 zamiast 1e-05), więc akceptowane są tylko kolumny
+    tekstowe, całkowite i zmiennoprzecinkowe z wartościami w tym zakresie.
+    """
+    for _, col in df.items():
+        if pd.api.types.is_float_dtype(col.dtype):
+            values = np.abs(col.to_numpy(dtype=np.float64, na_value=np.nan))
+            values = values[np.isfinite(values) & (values != 0)]
+            if values.size and (values.min() < 1e-4 or values.max() >= 1e16):
+                return False
+        elif pd.api.types.is_integer_dtype(col.dtype):
+            continue
+        elif pd.api.types.infer_dtype(col, skipna=True) not in ("string", "empty"):
+            return False
+    return True
+
+
+def write_results_csv(df: pd.DataFrame, path: str):
+    """
+    Zapisuje ramkę wyników do pliku CSV (separator ';', braki jako 'brak_danych').
+    Jeśli dostępny jest Polars i zapis będzie identyczny jak w pandas
+    (patrz polars_writes_like_pandas), używany jest jego wielowątkowy zapis CSV,
+    w przeciwnym razie standardowe pandas.to_csv.
+    """
+    if POLARS_AVAILABLE and polars_writes_like_pandas(df):
+        try:
+            import polars as pl
+
+            pl.from_pandas(df, nan_to_null=True).write_csv(
+                path, separator=";", null_value="brak_danych"
+            )
+            return
+        except Exception as e:
+            logging.debug(f"Zapis CSV przez Polars nie powiódł się ({e}), używam pandas.")
+    df.to_csv(path, sep=";", index=False, na_rep="brak_danych")
 
 
 def export_to_csv(
@@ -23,12 +91,8 @@ def export_to_csv(
         return
 
     # 1. Eksport całościowy
-    results_df.to_csv(
-        csv_path,
-        sep=";",
-        index=False,
-        na_rep="brak_danych",
-    )
+    output_df = format_accuracy_column(results_df)
+    write_results_csv(output_df, csv_path)
     print(
         f"{Fore.GREEN}Wyniki tabelaryczne (wszystkie) zapisano w: {os.path.abspath(csv_path)}{Style.RESET_ALL}"
     )
@@ -44,22 +108,14 @@ def export_to_csv(
         return
 
     # Przygotowanie do podziału
-    df_copy = results_df.copy()
-    df_copy["eksport"] = df_copy["osiaga_dokladnosc"].apply(
-        lambda x: str(x).strip().lower() == "tak"
-    )
+    eksport = accuracy_mask(results_df)
 
     # 2. Eksport tylko spełniających warunek dokładności
-    df_ok = df_copy[df_copy["eksport"]].drop(columns=["eksport"])
+    df_ok = output_df[eksport]
     if not df_ok.empty:
         base, ext = os.path.splitext(csv_path)
         path_ok = f"{base}_dokladne{ext}"
-        df_ok.to_csv(
-            path_ok,
-            sep=";",
-            index=False,
-            na_rep="brak_danych",
-        )
+        write_results_csv(df_ok, path_ok)
         print(
             f"{Fore.GREEN}Wyniki spełniające warunek dokładności zapisano w: {os.path.abspath(path_ok)}{Style.RESET_ALL}"
         )
@@ -69,16 +125,11 @@ def export_to_csv(
         )
 
     # 3. Eksport niespełniających warunku dokładności
-    df_nok = df_copy[~df_copy["eksport"]].drop(columns=["eksport"])
+    df_nok = output_df[~eksport]
     if not df_nok.empty:
         base, ext = os.path.splitext(csv_path)
         path_nok = f"{base}_niedokladne{ext}"
-        df_nok.to_csv(
-            path_nok,
-            sep=";",
-            index=False,
-            na_rep="brak_danych",
-        )
+        write_results_csv(df_nok, path_nok)
         print(
             f"{Fore.GREEN}Wyniki niespełniające warunku dokładności zapisano w: {os.path.abspath(path_nok)}{Style.RESET_ALL}"
         )
@@ -97,17 +148,16 @@ def export_to_geopackage(
 ):
     """
     Eksportuje wyniki do pliku GeoPackage.
-    Jeśli split_by_accuracy jest True, tworzy dodatkowe pliki _dokladne i _niedokladne.
+    Jeśli split_by_accuracy jest True, wyniki są zapisywane w jednym pliku w warstwach
+    'wszystkie', 'dokladne' i 'niedokladne'; w przeciwnym razie w warstwie layer_name.
     """
     if results_df.empty:
         print(f"{Fore.YELLOW}Brak danych do zapisu w GeoPackage.")
         return
-    source_epsg = None
-    if not input_df.empty:
-        # Używamy .copy(), aby uniknąć ostrzeżenia SettingWithCopyWarning
-        temp_input_df = assign_geodetic_roles(input_df.copy())
-        first_point_easting = temp_input_df.iloc[0]["geodetic_easting"]
-        source_epsg = get_source_epsg(first_point_easting)
+    # geopandas (shapely, GDAL) ładowany tylko przy eksporcie do GeoPackage
+    import geopandas as gpd
+
+    source_epsg = detect_source_epsg(input_df)
 
     if source_epsg is None:
         print(
@@ -123,7 +173,7 @@ def export_to_geopackage(
     logging.debug(f"Wykryto EPSG:{source_epsg} dla eksportu GeoPackage.")
 
     try:
-        df_geo = results_df.copy()
+        df_geo = format_accuracy_column(results_df)
 
         # W trybach 4 i 5 kolumny x,y są w `results_df`, a nie w `results_df` jako `x_odniesienia`
         x_col = "x_odniesienia" if "x_odniesienia" in df_geo.columns else "x"
@@ -133,51 +183,56 @@ def export_to_geopackage(
         geometry = gpd.points_from_xy(df_geo[y_col], df_geo[x_col])
         gdf = gpd.GeoDataFrame(df_geo, geometry=geometry, crs=f"EPSG:{source_epsg}")
 
+        split = split_by_accuracy and "osiaga_dokladnosc" in gdf.columns
+        if split_by_accuracy and not split:
+            print(
+                f"{Fore.YELLOW}Brak kolumny 'osiaga_dokladnosc', nie można podzielić wyników GeoPackage na warstwy."
+            )
+
+        # Wszystkie wyniki trafiają do jednego pliku; podział na dokładne/niedokładne
+        # to osobne warstwy tego pliku. Stary plik jest usuwany, aby nie zostały
+        # w nim warstwy z poprzedniego uruchomienia.
+        if os.path.exists(gpkg_path):
+            os.remove(gpkg_path)
+
         # 1. Eksport całościowy
-        gdf.to_file(gpkg_path, layer=layer_name, driver="GPKG")
+        gdf.to_file(
+            gpkg_path,
+            layer="wszystkie" if split else layer_name,
+            driver="GPKG",
+            engine=GPKG_ENGINE,
+        )
         print(
             f"{Fore.GREEN}Wyniki (wszystkie) zostały poprawnie zapisane w bazie przestrzennej: {os.path.abspath(gpkg_path)}{Style.RESET_ALL}"
         )
-
-        # 2. Logika dzielenia plików (uruchamiana warunkowo)
-        if split_by_accuracy:
-            if "osiaga_dokladnosc" not in gdf.columns:
-                print(
-                    f"{Fore.YELLOW}Brak kolumny 'osiaga_dokladnosc', nie można podzielić plików GeoPackage."
-                )
-                return
-
-            gdf["eksport"] = gdf["osiaga_dokladnosc"].apply(
-                lambda x: str(x).strip().lower() == "tak"
-            )
-
-            # Eksport tylko spełniających warunek dokładności
-            gdf_ok = gdf[gdf["eksport"]]
-            if not gdf_ok.empty:
-                base, ext = os.path.splitext(gpkg_path)
-                path_ok = f"{base}_dokladne{ext}"
-                gdf_ok.to_file(path_ok, layer=layer_name, driver="GPKG")
-                print(
-                    f"{Fore.GREEN}Wyniki spełniające warunek dokładności zapisano w: {os.path.abspath(path_ok)}{Style.RESET_ALL}"
-                )
-            else:
-                print(
-                    f"{Fore.YELLOW}Brak punktów spełniających warunek dokładności do eksportu GeoPackage."
+        if not split:
+            return
+
+        # 2. Warstwy z podziałem na dokładne/niedokładne
+        eksport = accuracy_mask(results_df).to_numpy()
+        for layer, subset, found_msg, empty_msg in (
+            (
+                "dokladne",
+                gdf[eksport],
+                "Wyniki spełniające warunek dokładności zapisano w warstwie",
+                "Brak punktów spełniających warunek dokładności do eksportu GeoPackage.",
+            ),
+            (
+                "niedokladne",
+                gdf[~eksport],
+                "Wyniki niespełniające warunku dokładności zapisano w warstwie",
+                "Brak punktów niespełniających warunku dokładności do eksportu GeoPackage.",
+            ),
+        ):
+            if not subset.empty:
+                subset.to_file(
+                    gpkg_path, layer=layer, driver="GPKG", mode="a", engine=GPKG_ENGINE
                 )
-
-            # Eksport niespełniających warunku dokładności
-            gdf_nok = gdf[~gdf["eksport"]]
-            if not gdf_nok.empty:
-                base, ext = os.path.splitext(gpkg_path)
-                path_nok = f"{base}_niedokladne{ext}"
-                gdf_nok.to_file(path_nok, layer=layer_name, driver="GPKG")
                 print(
-                    f"{Fore.GREEN}Wyniki niespełniające warunku dokładności zapisano w: {os.path.abspath(path_nok)}{Style.RESET_ALL}"
+                    f"{Fore.GREEN}{found_msg} '{layer}': {os.path.abspath(gpkg_path)}{Style.RESET_ALL}"
                 )
             else:
-                print(
-                    f"{Fore.YELLOW}Brak punktów niespełniających warunku dokładności do eksportu GeoPackage."
-                )
+                print(f"{Fore.YELLOW}{empty_msg}")
 
     except Exception as e:
         print(f"{Fore.RED}Wystąpił błąd podczas tworzenia pliku GeoPackage: {e}")
@@ -0,0 +1,96 @@
+"""
+Moduł trwałej pamięci podręcznej wysokości pobranych z Geoportalu (SQLite)
+"""
+
+import os
+import time
+import logging
+import sqlite3
+from contextlib import closing
+from typing import Dict, List
+from ..config.settings import GEOPORTAL_CACHE_ENABLED, GEOPORTAL_CACHE_MAX_AGE_DAYS
+from ..utils.cache_dir import get_user_cache_dir
+
+# Plik bazy w katalogu pamięci podręcznej użytkownika (katalog programu może być tylko do odczytu)
+CACHE_PATH = get_user_cache_dir("geoportal_heights.sqlite")
+# Maksymalna liczba parametrów w jednym zapytaniu SQL (limit starszych wersji SQLite to 999)
+SQL_BATCH_SIZE = 900
+
+
+def _connect() -> sqlite3.Connection:
+    """ Otwiera bazę pamięci podręcznej, tworząc katalog i tabelę przy pierwszym użyciu. """
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    connection = sqlite3.connect(CACHE_PATH)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS heights "
+        "(key INTEGER PRIMARY KEY, h REAL NOT NULL, fetched_at REAL NOT NULL)"
+    )
+    return connection
+
+
+def _oldest_valid_timestamp() -> float:
+    """
+    Zwraca najstarszy czas pobrania (sekundy od epoki), dla którego wysokość jest
+    jeszcze aktualna. Starsze wpisy są pobierane ponownie, aby uwzględnić
+    aktualizacje NMT. GEOPORTAL_CACHE_MAX_AGE_DAYS = 0 wyłącza wygasanie.
+    """
+    if GEOPORTAL_CACHE_MAX_AGE_DAYS <= 0:
+        return 0.0
+    return time.time() - GEOPORTAL_CACHE_MAX_AGE_DAYS * 86400
+
+
+def load_cached_heights(keys: List[int]) -> Dict[int, float]:
+    """
+    Odczytuje z pamięci podręcznej wysokości zapisane w poprzednich uruchomieniach.
+    Args:
+        keys (List[int]): Lista kluczy punktów (patrz geoportal_client.point_keys).
+    Returns:
+        Dict[int, float]: Słownik {klucz punktu: height} dla punktów znalezionych w bazie.
+    """
+    if not GEOPORTAL_CACHE_ENABLED or not keys:
+        return {}
+    cached = {}
+    oldest = _oldest_valid_timestamp()
+    try:
+        with closing(_connect()) as connection:
+            for i in range(0, len(keys), SQL_BATCH_SIZE):
+                chunk = keys[i : i + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cached.update(
+                    connection.execute(
+                        f"SELECT key, h FROM heights WHERE key IN ({placeholders}) AND fetched_at >= ?",
+                        [*chunk, oldest],
+                    )
+                )
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Nie udało się odczytać pamięci podręcznej wysokości: {e}")
+        return {}
+    logging.debug(f"Odczytano z pamięci podręcznej wysokości dla {len(cached)} z {len(keys)} punktów.")
+    return cached
+
+
+def store_heights(heights: Dict[int, float]):
+    """
+    Zapisuje pobrane wysokości w pamięci podręcznej (jedna transakcja) wraz z czasem
+    pobrania i usuwa wpisy starsze niż GEOPORTAL_CACHE_MAX_AGE_DAYS.
+    Wysokości 0.0 i NaN nie są zapisywane - API zwraca je także przy błędach,
+    więc takie punkty zostaną pobrane ponownie przy następnym uruchomieniu.
+    """
+    if not GEOPORTAL_CACHE_ENABLED:
+        return
+    fetched_at = time.time()
+    rows = [(key, h, fetched_at) for key, h in heights.items() if h == h and h != 0.0]
+    if not rows:
+        return
+    try:
+        with closing(_connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM heights WHERE fetched_at < ?", (_oldest_valid_timestamp(),)
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO heights (key, h, fetched_at) VALUES (?, ?, ?)", rows
+            )
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Nie udało się zapisać pamięci podręcznej wysokości: {e}")
+        return
+    logging.debug(f"Zapisano w pamięci podręcznej wysokości dla {len(rows)} punktów.")
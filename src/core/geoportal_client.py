@@ -3,56 +3,172 @@ Moduł komunikacji z API Geoportalu
 """
 
 import logging
-import requests
-from typing import Dict, List, Tuple, Optional
+import numpy as np
+import pandas as pd
+from functools import partial
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor
-from ..config.settings import CONCURRENT_API_REQUESTS, API_MAX_RETRIES
+from ..config.settings import (
+    CONCURRENT_API_REQUESTS,
+    API_MAX_RETRIES,
+    API_RETRY_BACKOFF,
+    API_BATCH_SIZE,
+)
+from .geoportal_cache import load_cached_heights, store_heights
 
+if TYPE_CHECKING:
+    import requests
 
-def fetch_height_batch(batch: List[Tuple[float, float]]) -> Dict[str, float]:
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+}
+
+
+def point_keys(points: np.ndarray) -> np.ndarray:
+    """
+    Zamienia współrzędne (easting, northing) w EPSG:2180 na liczbowe klucze wysokości.
+    Współrzędne są kwantowane do centymetrów (tak jak w zapytaniu do API)
+    i pakowane w jedną liczbę int64: (easting_cm << 32) | northing_cm.
+    Args:
+        points (np.ndarray): Tablica (N, 2) z kolumnami (easting, northing); NaN dla błędów.
+    Returns:
+        np.ndarray: Tablica int64 kluczy; -1 dla punktów z NaN.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    valid = ~np.isnan(points).any(axis=1)
+    points_cm = np.round(np.where(valid[:, None], points, 0.0) * 100).astype(np.int64)
+    keys = (points_cm[:, 0] << 32) | points_cm[:, 1]
+    return np.where(valid, keys, -1)
+
+
+def _api_key(northing_api: Union[str, bytes], easting_api: Union[str, bytes]) -> int:
+    """ Klucz wysokości dla współrzędnych zwróconych przez API (tekst). """
+    return (round(float(easting_api) * 100) << 32) | round(float(northing_api) * 100)
+
+
+def _format_cm(value_cm: int) -> str:
+    """ Formatuje współrzędną w centymetrach jako tekst z dwoma miejscami po przecinku. """
+    return f"{value_cm // 100}.{value_cm % 100:02d}"
+
+
+def lookup_heights(heights: Dict[int, float], points: np.ndarray) -> np.ndarray:
+    """
+    Zwraca wysokości z Geoportalu dla punktów (easting, northing) w EPSG:2180.
+    Args:
+        heights (Dict[int, float]): Słownik wysokości z get_geoportal_heights_concurrent.
+        points (np.ndarray): Tablica (N, 2) przekształconych współrzędnych; NaN dla błędów.
+    Returns:
+        np.ndarray: Wysokości (float64); NaN dla punktów bez danych.
+    """
+    return pd.Series(point_keys(points)).map(heights).to_numpy(dtype=np.float64)
+
+
+def parse_height_response(content: bytes) -> Dict[int, float]:
+    """
+    Parsuje odpowiedź GetHByPointList ("northing easting h,northing easting h,...")
+    bezpośrednio z bajtów odpowiedzi, bez dekodowania i kopiowania jej jako tekstu.
+    Args:
+        content (bytes): Treść odpowiedzi API.
+    Returns:
+        Dict[int, float]: Słownik {klucz punktu: height}; 0.0 dla nieczytelnej wysokości.
+    """
+    batch_heights = {}
+    for line in content.split(b","):
+        parts = line.split()
+        if len(parts) == 3:
+            northing_api, easting_api, h_api = parts
+            try:
+                key = _api_key(northing_api, easting_api)
+            except ValueError:
+                continue
+            try:
+                batch_heights[key] = float(h_api)
+            except ValueError:
+                batch_heights[key] = 0.0
+    return batch_heights
+
+
+_SESSION: Optional["requests.Session"] = None
+
+
+def create_session() -> "requests.Session":
+    """
+    Tworzy sesję HTTP z pulą połączeń (keep-alive) współdzieloną przez wątki,
+    dzięki czemu kolejne paczki nie zestawiają od nowa połączenia TCP/TLS.
+    Błędy połączenia i przeciążenia serwera (429, 5xx) są ponawiane przez adapter
+    z wykładniczo rosnącym odstępem między próbami.
+    """
+    # requests (i stos SSL) ładowany dopiero przy pierwszym użyciu Geoportalu
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=API_MAX_RETRIES - 1,
+        backoff_factor=API_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=CONCURRENT_API_REQUESTS,
+        pool_maxsize=CONCURRENT_API_REQUESTS,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> "requests.Session":
+    """
+    Zwraca wspólną dla modułu sesję HTTP (tworzoną przy pierwszym użyciu),
+    aby połączenia z Geoportalem były utrzymywane także między kolejnymi
+    przebiegami i ponownymi próbami w tym samym procesie.
+    """
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = create_session()
+    return _SESSION
+
+
+def fetch_height_batch(
+    batch: List[int], session: Optional["requests.Session"] = None
+) -> Dict[int, float]:
     """
     Funkcja do pobierania wysokości z Geoportalu dla paczki współrzędnych.
     Args:
-        batch (List[Tuple[float, float]]): Lista współrzędnych w formacie [(easting, northing), ...].
+        batch (List[int]): Lista kluczy punktów (patrz point_keys).
+        session (Optional[requests.Session]): Sesja HTTP do ponownego użycia połączeń.
     Returns:
-        Dict[str, float]: Słownik z wysokościami w formacie {'northing easting': height}.
+        Dict[int, float]: Słownik z wysokościami w formacie {klucz punktu: height}.
     """
+    import requests
+
     if not batch:
         return {}
     # Usuwanie duplikatów z paczki (API zwraca wysokość dla każdej współrzędnej, ale klucz w słowniku bywa nadpisany)
     unique_batch = list(dict.fromkeys(batch))
+    # Tekst zapytania budowany z tych samych centymetrów co klucz, więc odpowiedź API
+    # zawsze daje się odwzorować z powrotem na klucz punktu
     point_strings = [
-        f"{northing:.2f} {easting:.2f}" for easting, northing in unique_batch
+        f"{_format_cm(key & 0xFFFFFFFF)} {_format_cm(key >> 32)}" for key in unique_batch
     ]
     list_parameter = ",".join(point_strings)
     url = f"https://services.gugik.gov.pl/nmt/?request=GetHByPointList&list={list_parameter}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
-    }
+    http = session if session is not None else get_session()
     for attempt in range(1, API_MAX_RETRIES + 1):
         logging.debug(f"Wysyłka do Geoportalu (próba {attempt}): URL={url}")
         try:
-            response = requests.get(url, timeout=30, headers=headers)
-            logging.debug(f"Odpowiedź: status={response.status_code}, body={response.text}")
+            response = http.get(url, timeout=30, headers=REQUEST_HEADERS)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Odpowiedź: status={response.status_code}, body={response.text}")
             response.raise_for_status()
-            batch_heights = {}
-            if response.text.strip():
-                results = response.text.strip().split(",")
-                all_zero = True
-                for line in results:
-                    parts = line.strip().split()
-                    if len(parts) == 3:
-                        northing_api, easting_api, h_api = parts
-                        key = f"{northing_api} {easting_api}"
-                        try:
-                            h_val = float(h_api)
-                            batch_heights[key] = h_val
-                            if h_val != 0.0:
-                                all_zero = False
-                        except ValueError:
-                            batch_heights[key] = 0.0
+            if response.content.strip():
+                batch_heights = parse_height_response(response.content)
                 # Jeśli wszystkie wysokości to 0.0, powtórz zapytanie (chyba że to ostatnia próba)
+                all_zero = not any(batch_heights.values())
                 if all_zero and attempt < API_MAX_RETRIES:
                     logging.warning("Ostrzeżenie: Wszystkie wysokości 0.0, ponawiam próbę...")
                     continue
@@ -61,80 +177,96 @@ def fetch_height_batch(batch: List[Tuple[float, float]]) -> Dict[str, float]:
                 logging.warning("Pusta odpowiedź, ponawiam próbę...")
                 continue
         except requests.exceptions.RequestException as e:
+            # Błędy transportowe były już ponawiane przez adapter sesji (create_session)
             logging.error(f"Błąd komunikacji z API (próba {attempt}): {e}")
-            if attempt == API_MAX_RETRIES:
-                from colorama import Fore
-                print(f"{Fore.RED}Błąd komunikacji z API: {e}")
+            from colorama import Fore
+            print(f"{Fore.RED}Błąd komunikacji z API: {e}")
+            return {}
     # Jeśli po wszystkich próbach nie udało się uzyskać poprawnych danych
     logging.error(f"Nie udało się uzyskać poprawnych danych z Geoportalu po {API_MAX_RETRIES} próbach.")
     return {}
 
 
 def fetch_missing_heights(
-    missing_points: List[Tuple[float, float]],
-) -> Dict[str, float]:
+    missing_points: List[int],
+    session: Optional["requests.Session"] = None,
+) -> Dict[int, float]:
     """
     Funkcja do ponownego pobierania wysokości dla punktów, które nie miały danych.
     Args:
-        missing_points (List[Tuple[float, float]]): Lista współrzędnych punktów, dla których brakuje danych wysokości.
+        missing_points (List[int]): Lista kluczy punktów, dla których brakuje danych wysokości.
+        session (Optional[requests.Session]): Sesja HTTP do ponownego użycia połączeń.
     Returns:
-        Dict[str, float]: Słownik z wysokościami w formacie {'northing easting': height}.
+        Dict[int, float]: Słownik z wysokościami w formacie {klucz punktu: height}.
     """
     if not missing_points:
         return {}
     logging.debug(f"Ponowna próba pobrania wysokości dla {len(missing_points)} punktów z 'brak_danych'.")
-    return fetch_height_batch(missing_points)
+    return fetch_height_batch(missing_points, session=session)
 
 
 def get_geoportal_heights_concurrent(
-    transformed_points: List[Optional[Tuple[float, float]]],
-) -> Dict[str, float]:
+    transformed_points: np.ndarray,
+) -> Dict[int, float]:
     """
     Funkcja do pobierania wysokości z Geoportalu dla przekształconych współrzędnych.
     Args:
-        transformed_points (List[Optional[Tuple[float, float]]]): Lista przekształconych współrzędnych w formacie [(x, y), ...] lub None dla błędów.
+        transformed_points (np.ndarray): Tablica (N, 2) przekształconych współrzędnych (x, y); NaN dla błędów.
     Returns:
-        Dict[str, float]: Słownik z wysokościami w formacie {'northing easting': height}.
+        Dict[int, float]: Słownik z wysokościami w formacie {klucz punktu: height};
+                          do odczytu wysokości dla punktów służy lookup_heights.
     """
     from colorama import Fore, Style
     print(f"\n{Fore.CYAN}Pobieranie danych z Geoportalu ...{Style.RESET_ALL}")
     logging.debug("Rozpoczęto pobieranie wysokości z Geoportalu.")
 
-    valid_points = [p for p in transformed_points if p is not None]
-    logging.debug(f"Liczba poprawnych punktów do pobrania wysokości: {len(valid_points)}")
+    keys = point_keys(transformed_points)
+    # Powtarzające się współrzędne (np. ten sam punkt pomierzony kilkukrotnie) są
+    # wysyłane tylko raz - deduplikacja dla całego zbioru, a nie tylko w paczce
+    valid_points = pd.unique(keys[keys >= 0]).tolist()
+    logging.debug(f"Liczba unikalnych punktów do pobrania wysokości: {len(valid_points)}")
 
     if not valid_points:
-        from colorama import Fore, Style
         print(f"{Fore.YELLOW}Brak poprawnych punktów do wysłania do API Geoportalu.")
         return {}
 
-    batch_size = 300
+    # Wysokości pobrane w poprzednich uruchomieniach nie są pobierane ponownie
+    all_heights = load_cached_heights(valid_points)
+    if all_heights:
+        print(
+            f"{Fore.CYAN}Wysokości dla {len(all_heights)} z {len(valid_points)} punktów odczytano z pamięci podręcznej.{Style.RESET_ALL}"
+        )
+    points_to_fetch = [key for key in valid_points if key not in all_heights]
+    if not points_to_fetch:
+        return all_heights
+
+    batch_size = API_BATCH_SIZE
     batches = [
-        valid_points[i : i + batch_size]
-        for i in range(0, len(valid_points), batch_size)
+        points_to_fetch[i : i + batch_size]
+        for i in range(0, len(points_to_fetch), batch_size)
     ]
     logging.debug(f"Liczba partii do pobrania: {len(batches)} (po {batch_size} punktów)")
-    all_heights = {}
+    fetched_heights = {}
+    session = get_session()
     with ThreadPoolExecutor(max_workers=CONCURRENT_API_REQUESTS) as executor:
         results = list(
             tqdm(
-                executor.map(fetch_height_batch, batches),
+                executor.map(partial(fetch_height_batch, session=session), batches),
                 total=len(batches),
                 desc="Pobieranie z Geoportalu",
             )
         )
     for batch_result in results:
-        all_heights.update(batch_result)
+        fetched_heights.update(batch_result)
     # --- Ponowna próba dla punktów, które nie mają wysokości ---
-    missing_points = []
-    for p in valid_points:
-        lookup_key = f"{p[1]:.2f} {p[0]:.2f}"
-        if lookup_key not in all_heights:
-            missing_points.append(p)
+    missing_points = [key for key in points_to_fetch if key not in fetched_heights]
     if missing_points:
-        retry_heights = fetch_missing_heights(missing_points)
-        all_heights.update(retry_heights)
+        retry_heights = fetch_missing_heights(missing_points, session=session)
+        fetched_heights.update(retry_heights)
         logging.debug(f"Po ponownej próbie uzyskano wysokości dla {len(retry_heights)} z {len(missing_points)} brakujących punktów.")
 
+    store_heights(fetched_heights)
+    all_heights.update(fetched_heights)
+
     logging.debug(f"Łącznie pobrano wysokości dla {len(all_heights)} punktów z Geoportalu.")
     return all_heights 
\ No newline at end of file
@@ -5,9 +5,7 @@ Moduł generowania rozrzedzonej siatki heksagonalnej
 import logging
 import numpy as np
 import pandas as pd
-from scipy.spatial import KDTree
 from tqdm import tqdm
-from matplotlib.path import Path
 from colorama import Fore, Style
 from ..config.settings import DEBUG_MODE
 
@@ -23,6 +21,8 @@ def generuj_srodki_heksagonalne_wektorowo(
     :param odleglosc_miedzy_punktami: Oczekiwana odległość między środkami okręgów.
     :return: Posortowana tablica NumPy ze środkami [(x, y), ...].
     """
+    from matplotlib.path import Path
+
     d = odleglosc_miedzy_punktami
     dx, dy = d, d * np.sqrt(3) / 2
     sciezka_obszaru = Path(obszar_wielokat)
@@ -97,6 +97,10 @@ def znajdz_punkty_dla_siatki(
     :param odleglosc_siatki: Oczekiwana odległość między punktami siatki (promień okręgu to połowa tej wartości).
     :return: DataFrame z wynikami dla siatki.
     """
+    # SciPy i Matplotlib są potrzebne tylko w trybie siatki - import przy pierwszym użyciu
+    from scipy.spatial import cKDTree
+    from matplotlib.path import Path
+
     # === POCZĄTEK ZMIAN ===
     # Krok 1: Wstępne filtrowanie punktów-kandydatów, aby zawierały tylko te wewnątrz zadanego zakresu
     logging.debug("Filtrowanie punktów-kandydatów względem zadanego zakresu...")
@@ -129,7 +133,10 @@ def znajdz_punkty_dla_siatki(
     # === KONIEC ZMIAN ===
 
     punkty_np = dane_punktow.values
-    drzewo_kd = KDTree(punkty_np[:, :2])
+    # Kolejność kandydatów (a więc rozstrzyganie pełnych remisów kryteriów wyboru)
+    # zależy od budowy drzewa: leafsize=10 jak w domyślnym KDTree daje tę samą
+    # kolejność co dotychczasowe zapytania dla pojedynczych punktów (nieposortowane)
+    drzewo_kd = cKDTree(punkty_np[:, :2], leafsize=10)
     print("\nGenerowanie siatki pokrycia heksagonalnego...")
     lista_srodkow = generuj_srodki_heksagonalne_wektorowo(obszar_wielokat, odleglosc_siatki) 
     if lista_srodkow.shape[0] == 0:
@@ -140,44 +147,59 @@ def znajdz_punkty_dla_siatki(
         return pd.DataFrame()
     print(f"Wygenerowano {len(lista_srodkow)} środków okręgów w zadanym obszarze.")
     logging.debug(f"Wygenerowano {len(lista_srodkow)} środków siatki heksagonalnej.")
-    odwiedzone_indeksy_w_np = set()
+    # Kandydaci dla wszystkich środków jednym zapytaniem (wielowątkowo, bez GIL);
+    # sama selekcja musi pozostać sekwencyjna, bo zależy od już wybranych punktów
+    kandydaci_dla_srodkow = drzewo_kd.query_ball_point(
+        lista_srodkow, r=promien_szukania, workers=-1, return_sorted=False
+    )
+    # Kryteria wyboru liczone raz dla wszystkich punktów; odwiedzone punkty
+    # oznaczane w tablicy logicznej zamiast w zbiorze Pythona
+    roznice_h = np.abs(punkty_np[:, 2] - punkty_np[:, 3])
+    odwiedzone = np.zeros(len(punkty_np), dtype=bool)
     wyniki_siatki = []
-    for srodek in tqdm(lista_srodkow, desc="Przetwarzanie siatki heksagonalnej"):
-        logging.debug(f"Przetwarzanie środka heksagonu: ({srodek[0]:.2f}, {srodek[1]:.2f})")
-        kandydaci_idx_w_np = drzewo_kd.query_ball_point(srodek, r=promien_szukania)
-        logging.debug(f"  Znaleziono {len(kandydaci_idx_w_np)} kandydatów w promieniu {promien_szukania:.2f}m.")
-        
-        aktualni_kandydaci_idx = [
-            idx for idx in kandydaci_idx_w_np if idx not in odwiedzone_indeksy_w_np
-        ]
-        
-        if not aktualni_kandydaci_idx:
-            logging.debug("  Brak nowych kandydatów w tym okręgu. Pomijam.")
+    # Sprawdzane raz przed pętlą, aby komunikaty diagnostyczne (i obliczenia
+    # w nich zawarte) nie były formatowane dla każdego środka bez trybu DEBUG
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for srodek, kandydaci_idx_w_np in tqdm(
+        zip(lista_srodkow, kandydaci_dla_srodkow),
+        total=len(lista_srodkow),
+        desc="Przetwarzanie siatki heksagonalnej",
+        mininterval=0.2,
+    ):
+        if debug:
+            logging.debug(f"Przetwarzanie środka heksagonu: ({srodek[0]:.2f}, {srodek[1]:.2f})")
+            logging.debug(f"  Znaleziono {len(kandydaci_idx_w_np)} kandydatów w promieniu {promien_szukania:.2f}m.")
+
+        kandydaci = np.asarray(kandydaci_idx_w_np, dtype=np.intp)
+        aktualni_kandydaci_idx = kandydaci[~odwiedzone[kandydaci]]
+
+        if aktualni_kandydaci_idx.size == 0:
+            if debug:
+                logging.debug("  Brak nowych kandydatów w tym okręgu. Pomijam.")
             continue
-        logging.debug(f"  Po odfiltrowaniu odwiedzonych, pozostało {len(aktualni_kandydaci_idx)} kandydatów.")
-
-        najlepszy_idx_w_np = min(
-            aktualni_kandydaci_idx,
-            key=lambda idx: (
-                abs(punkty_np[idx, 2] - punkty_np[idx, 3]),
-                np.linalg.norm(punkty_np[idx, :2] - srodek),
-            ),
-        )
-        
-        odwiedzone_indeksy_w_np.add(najlepszy_idx_w_np)
+        if debug:
+            logging.debug(f"  Po odfiltrowaniu odwiedzonych, pozostało {len(aktualni_kandydaci_idx)} kandydatów.")
+
+        # Najmniejsza różnica wysokości, a przy remisie najmniejsza odległość od środka
+        # (lexsort jest stabilny, więc pełny remis rozstrzyga kolejność kandydatów)
+        przesuniecia = punkty_np[aktualni_kandydaci_idx, :2] - srodek
+        odleglosci = np.sqrt((przesuniecia * przesuniecia).sum(axis=1))
+        najlepszy_idx_w_np = aktualni_kandydaci_idx[
+            np.lexsort((odleglosci, roznice_h[aktualni_kandydaci_idx]))[0]
+        ]
+
+        odwiedzone[najlepszy_idx_w_np] = True
         oryginalny_indeks_df = dane_punktow.index[najlepszy_idx_w_np]
-        # === POCZĄTEK ZMIAN ===
-        # Upewniamy się, że odwołujemy się do przefiltrowanej ramki danych
-        znaleziony_punkt_dane = punkty_w_obszarze.loc[oryginalny_indeks_df]
-        # === KONIEC ZMIAN ===
-        
-        logging.debug(f"  Wybrano najlepszego kandydata: ID={znaleziony_punkt_dane['id_odniesienia']}, odległość od środka: {np.linalg.norm(punkty_np[najlepszy_idx_w_np, :2] - srodek):.2f}m, diff_h_geoportal: {abs(punkty_np[najlepszy_idx_w_np, 2] - punkty_np[najlepszy_idx_w_np, 3]):.3f}m")
-        
-        wyniki_siatki.append(znaleziony_punkt_dane)
-        
+
+        if debug:
+            logging.debug(f"  Wybrano najlepszego kandydata: ID={punkty_w_obszarze.at[oryginalny_indeks_df, 'id_odniesienia']}, odległość od środka: {np.linalg.norm(punkty_np[najlepszy_idx_w_np, :2] - srodek):.2f}m, diff_h_geoportal: {abs(punkty_np[najlepszy_idx_w_np, 2] - punkty_np[najlepszy_idx_w_np, 3]):.3f}m")
+
+        wyniki_siatki.append(oryginalny_indeks_df)
+
     if not wyniki_siatki:
         logging.warning("Nie znaleziono żadnych punktów do siatki po przetworzeniu wszystkich środków.")
         return pd.DataFrame()
         
     logging.debug(f"Zakończono przetwarzanie siatki. Wybrano {len(wyniki_siatki)} punktów.")
-    return pd.DataFrame(wyniki_siatki).reset_index(drop=True)
\ No newline at end of file
+    # Wybrane wiersze pobierane z przefiltrowanej ramki jednym odwołaniem
+    return punkty_w_obszarze.loc[wyniki_siatki].reset_index(drop=True)
\ No newline at end of file
@@ -5,10 +5,9 @@ Główny moduł procesora aplikacji diffH
 import os
 import logging
 import traceback
+import numpy as np
 import pandas as pd
 from typing import Optional
-from tqdm import tqdm
-from scipy.spatial import KDTree
 from colorama import Fore, Style
 
 from ..utils.logging_config import setup_logging
@@ -32,18 +31,37 @@ from .data_loader import (
     load_data,
     load_scope_data,
     assign_geodetic_roles,
-    get_source_epsg,
+    detect_source_epsg,
 )
 from .coordinate_transform import (
     transform_coordinates_parallel,
     get_transformation_method_info,
 )
-from .geoportal_client import get_geoportal_heights_concurrent
+from .geoportal_client import get_geoportal_heights_concurrent, lookup_heights
 from .grid_generator import (
     znajdz_punkty_dla_siatki,
     generuj_srodki_heksagonalne_wektorowo,
 )
-from .export import export_to_csv, export_to_geopackage
+from .export import export_to_csv, export_to_geopackage, accuracy_mask
+
+
+def round_like_builtin(values, decimals: int) -> np.ndarray:
+    """
+    Zaokrągla wartości tablicy tak jak wbudowane round().
+    np.round mnoży przez 10^n, przez co inaczej rozstrzyga remisy (np. 38.735),
+    a wyniki muszą być zgodne z dotychczasowym zaokrąglaniem wartości.
+    Poza otoczeniem połówki (kilka ulp) oba sposoby dają ten sam wynik, więc
+    round() jest wywoływane tylko dla tych nielicznych wartości.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.round(values, decimals)
+    scaled = values * 10.0**decimals
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    idx = np.flatnonzero(near_half)
+    if idx.size:
+        result[idx] = [round(v, decimals) for v in values[idx].tolist()]
+    return result
 
 
 def generate_output_filename(mode: int, base_name: str, extension: str) -> str:
@@ -98,32 +116,19 @@ def process_geoportal_only_data(
     print(f"{Fore.CYAN}Metoda transformacji: {transformation_method}{Style.RESET_ALL}")
 
     transformed_points = transform_coordinates_parallel(input_df)
-    geoportal_heights = {}
-    if transformed_points:
+    heights = np.full(len(input_df), np.nan)
+    if len(transformed_points):
         geoportal_heights = get_geoportal_heights_concurrent(transformed_points)
-
-    results = []
-    for i, (_, point) in enumerate(
-        tqdm(input_df.iterrows(), total=len(input_df), desc="Pobieranie wysokości")
-    ):
-        height = "brak_danych"
-        if i < len(transformed_points):
-            transformed_point = transformed_points[i]
-            if transformed_point:
-                easting_2180, northing_2180 = transformed_point
-                lookup_key = f"{northing_2180:.2f} {easting_2180:.2f}"
-                height = geoportal_heights.get(lookup_key, "brak_danych")
-
-        results.append(
-            {
-                "id": point["id"],
-                "x": point["x"],
-                "y": point["y"],
-                "h": height,
-            }
-        )
-
-    results_df = pd.DataFrame(results)
+        heights = lookup_heights(geoportal_heights, transformed_points)
+
+    results_df = pd.DataFrame(
+        {
+            "id": input_df["id"].to_numpy(),
+            "x": input_df["x"].to_numpy(),
+            "y": input_df["y"].to_numpy(),
+            "h": heights,
+        }
+    )
 
     # Zastosowanie stałego zaokrąglenia dla trybów 4 i 5
     results_df["x"] = pd.to_numeric(results_df["x"], errors="coerce").round(2)
@@ -147,11 +152,10 @@ def process_data(
     Główna funkcja przetwarzająca dane wejściowe, wykonująca transformację współrzędnych,
     porównanie z danymi referencyjnymi oraz eksport wyników do pliku GeoPackage.
     """
-    results = []
     input_df = assign_geodetic_roles(input_df)
     logging.debug("Rozpoczęto główną funkcję przetwarzania danych 'process_data'.")
 
-    geoportal_heights, transformed_points = {}, []
+    geoportal_heights, transformed_points = {}, np.empty((0, 2))
     if use_geoportal:
         transformation_method = get_transformation_method_info()
         print(
@@ -159,14 +163,14 @@ def process_data(
         )
 
         transformed_points = transform_coordinates_parallel(input_df)
-        if transformed_points:
+        if len(transformed_points):
             geoportal_heights = get_geoportal_heights_concurrent(transformed_points)
 
     if DEBUG_MODE and use_geoportal:
-        if transformed_points:
+        if len(transformed_points):
             transform_results_for_debug = [
                 {"id_punktu": input_df.iloc[i]["id"], "x_2180": p[0], "y_2180": p[1]}
-                if p
+                if not np.isnan(p).any()
                 else {
                     "id_punktu": input_df.iloc[i]["id"],
                     "x_2180": "Błąd",
@@ -191,8 +195,10 @@ def process_data(
                 "x_odniesienia": input_df.iloc[i]["x"],
                 "y_odniesienia": input_df.iloc[i]["y"],
             }
-            for i, p in enumerate(transformed_points)
-            if p and f"{p[1]:.2f} {p[0]:.2f}" not in geoportal_heights
+            for i in np.flatnonzero(
+                ~np.isnan(transformed_points).any(axis=1)
+                & np.isnan(lookup_heights(geoportal_heights, transformed_points))
+            )
         ]
         if missing_height_points:
             pd.DataFrame(missing_height_points).to_csv(
@@ -205,94 +211,84 @@ def process_data(
                 f"Zapisano {len(missing_height_points)} punktów bez wysokości z Geoportalu do pliku debug_geoportal_brak_wysokosci.csv"
             )
 
-    tree_comparison = None
+    results_df = pd.DataFrame(
+        {
+            "id_odniesienia": input_df["id"].to_numpy(),
+            "x_odniesienia": input_df["x"].to_numpy(),
+            "y_odniesienia": input_df["y"].to_numpy(),
+            "h_odniesienia": input_df["h"].to_numpy(),
+        }
+    )
+    input_h = pd.to_numeric(results_df["h_odniesienia"], errors="coerce")
+
+    paired_count = 0
     if comparison_df is not None and not comparison_df.empty:
-        comparison_points = comparison_df[["x", "y"]].values
-        tree_comparison = KDTree(comparison_points)
+        from scipy.spatial import cKDTree
+
+        comparison_points = np.ascontiguousarray(
+            comparison_df[["x", "y"]].to_numpy(dtype=np.float64)
+        )
+        # Drzewo niezbalansowane buduje się szybciej, a dla chmur punktów
+        # pomiarowych nie pogarsza to czasu zapytań
+        tree_comparison = cKDTree(
+            comparison_points, leafsize=32, balanced_tree=False, compact_nodes=False
+        )
         logging.debug("Utworzono KDTree dla pliku porównawczego.")
 
-    paired_count = 0
-    for i, (_, point) in enumerate(
-        tqdm(input_df.iterrows(), total=len(input_df), desc="Przetwarzanie punktów")
-    ):
-        row_data = {
-            "id_odniesienia": point["id"],
-            "x_odniesienia": point["x"],
-            "y_odniesienia": point["y"],
-            "h_odniesienia": point["h"],
-        }
+        # Jedno wsadowe zapytanie dla wszystkich punktów wejściowych (wielowątkowo).
+        # Przy zadanej odległości maksymalnej drzewo odcina gałęzie dalsze niż
+        # próg; punkty bez pary dostają odległość inf.
+        input_points = np.ascontiguousarray(input_df[["x", "y"]].to_numpy(dtype=np.float64))
+        upper_bound = np.nextafter(max_distance, np.inf) if max_distance > 0 else np.inf
+        distances, nearest_indices = tree_comparison.query(
+            input_points, k=1, workers=-1, distance_upper_bound=upper_bound
+        )
+        paired_mask = distances <= max_distance if max_distance > 0 else np.isfinite(distances)
+        paired_indices = nearest_indices[paired_mask]
 
-        if tree_comparison is not None and comparison_df is not None:
-            row_data.update(
-                {
-                    "id_porownania": "brak_danych",
-                    "x_porownania": "brak_danych",
-                    "y_porownania": "brak_danych",
-                    "h_porownania": "brak_danych",
-                    "odleglosc_pary": "brak_danych",
-                    "diff_h": "brak_danych",
-                }
-            )
+        # Kolumny pliku porównawczego jako tablice NumPy indeksowane wprost wynikami drzewa
+        comparison_h = pd.to_numeric(comparison_df["h"], errors="coerce").to_numpy(
+            dtype=np.float64
+        )
+        results_df["id_porownania"] = "brak_danych"
+        for col in ["x_porownania", "y_porownania", "h_porownania", "odleglosc_pary"]:
+            results_df[col] = np.nan
+        results_df.loc[paired_mask, "id_porownania"] = comparison_df["id"].to_numpy()[
+            paired_indices
+        ]
+        results_df.loc[paired_mask, "x_porownania"] = comparison_points[paired_indices, 0]
+        results_df.loc[paired_mask, "y_porownania"] = comparison_points[paired_indices, 1]
+        results_df.loc[paired_mask, "h_porownania"] = comparison_h[paired_indices]
+        results_df.loc[paired_mask, "odleglosc_pary"] = round_like_builtin(
+            distances[paired_mask], 3
+        )
+        # Dodanie 0.0 zamienia -0.0 na 0.0
+        results_df["diff_h"] = (
+            round_like_builtin(input_h - results_df["h_porownania"], round_decimals)
+            + 0.0
+        )
+        paired_count = int(paired_mask.sum())
 
-            distance, nearest_idx = tree_comparison.query([point["x"], point["y"]])
-
-            if (max_distance == 0) or (distance <= max_distance):
-                nearest_in_comp_point = comparison_df.iloc[nearest_idx]
-                row_data.update(
-                    {
-                        "id_porownania": nearest_in_comp_point["id"],
-                        "x_porownania": nearest_in_comp_point["x"],
-                        "y_porownania": nearest_in_comp_point["y"],
-                        "h_porownania": nearest_in_comp_point["h"],
-                        "odleglosc_pary": round(distance, 3),
-                    }
-                )
-                try:
-                    diff = float(point["h"]) - float(nearest_in_comp_point["h"])
-                    diff_rounded = round(diff, round_decimals)
-                    row_data["diff_h"] = 0.0 if diff_rounded == -0.0 else diff_rounded
-                except (ValueError, TypeError):
-                    row_data["diff_h"] = "brak_danych"
-                paired_count += 1
-
-        if use_geoportal and i < len(transformed_points):
-            transformed_point = transformed_points[i]
-            if transformed_point:
-                easting_2180, northing_2180 = transformed_point
-                lookup_key = f"{northing_2180:.2f} {easting_2180:.2f}"
-                height = geoportal_heights.get(lookup_key, "brak_danych")
-                row_data["geoportal_h"] = str(height)
-                if height != "brak_danych" and pd.notnull(point["h"]):
-                    try:
-                        diff_h_geoportal = round(
-                            float(point["h"]) - float(height), round_decimals
-                        )
-                        row_data["diff_h_geoportal"] = (
-                            0.0 if diff_h_geoportal == -0.0 else diff_h_geoportal
-                        )
-                    except (ValueError, TypeError):
-                        row_data["diff_h_geoportal"] = "brak_danych"
-                else:
-                    if "diff_h_geoportal" not in row_data:
-                        row_data["diff_h_geoportal"] = "brak_danych"
-            else:
-                row_data["geoportal_h"] = "brak_danych"
-                row_data["diff_h_geoportal"] = "brak_danych"
-
-        if geoportal_tolerance is not None and "diff_h_geoportal" in row_data:
-            diff_val = row_data["diff_h_geoportal"]
-            if isinstance(diff_val, (int, float)):
-                row_data["osiaga_dokladnosc"] = (
-                    "Tak" if abs(diff_val) <= geoportal_tolerance else "Nie"
-                )
-        elif comparison_tolerance is not None and "diff_h" in row_data:
-            diff_val = row_data["diff_h"]
-            if isinstance(diff_val, (int, float)):
-                row_data["osiaga_dokladnosc"] = (
-                    "Tak" if abs(diff_val) <= comparison_tolerance else "Nie"
-                )
+    if use_geoportal:
+        heights = lookup_heights(geoportal_heights, transformed_points)
+        results_df["geoportal_h"] = heights
+        results_df["diff_h_geoportal"] = (
+            round_like_builtin(input_h - heights, round_decimals) + 0.0
+        )
 
-        results.append(row_data)
+    diff_col, tolerance = None, None
+    if geoportal_tolerance is not None and "diff_h_geoportal" in results_df.columns:
+        diff_col, tolerance = "diff_h_geoportal", geoportal_tolerance
+    elif comparison_tolerance is not None and "diff_h" in results_df.columns:
+        diff_col, tolerance = "diff_h", comparison_tolerance
+
+    if diff_col is not None and results_df[diff_col].notna().any():
+        diff_values = results_df[diff_col]
+        # Kolumna logiczna (True/False, brak dla punktów bez różnicy);
+        # na 'Tak'/'Nie' zamieniana dopiero przy zapisie plików
+        results_df["osiaga_dokladnosc"] = (
+            (diff_values.abs() <= tolerance).astype("boolean").where(diff_values.notna())
+        )
 
     if comparison_df is not None:
         print(
@@ -300,8 +296,6 @@ def process_data(
         )
         logging.debug(f"Znaleziono i połączono {paired_count} par punktów.")
 
-    results_df = pd.DataFrame(results)
-
     # Zastosowanie zaokrąglenia do kolumn wynikowych
     results_df["x_odniesienia"] = pd.to_numeric(
         results_df["x_odniesienia"], errors="coerce"
@@ -343,12 +337,13 @@ def process_data(
         sort_col = "diff_h"
 
     if sort_col:
-        results_df[f"__abs_{sort_col}"] = pd.to_numeric(
-            results_df[sort_col], errors="coerce"
-        ).abs()
+        # Sortowanie po wartości bezwzględnej przez key= - bez kolumny pomocniczej
+        # i jej późniejszego usuwania (każde z nich kopiowało całą ramkę)
         results_df = results_df.sort_values(
-            by=f"__abs_{sort_col}", ascending=False
-        ).drop(columns=[f"__abs_{sort_col}"])
+            by=sort_col,
+            ascending=False,
+            key=lambda col: pd.to_numeric(col, errors="coerce").abs(),
+        )
 
     final_cols = [
         "id_odniesienia",
@@ -668,12 +663,8 @@ def main(config_path: str):
     )
 
     if sparse_grid_requested and zakres_df is not None:
-        input_epsg = get_source_epsg(
-            assign_geodetic_roles(input_df.copy()).iloc[0]["geodetic_easting"]
-        )
-        zakres_epsg = get_source_epsg(
-            assign_geodetic_roles(zakres_df.copy()).iloc[0]["geodetic_easting"]
-        )
+        input_epsg = detect_source_epsg(input_df)
+        zakres_epsg = detect_source_epsg(zakres_df)
         if input_epsg and zakres_epsg and input_epsg != zakres_epsg:
             print(
                 f"\n{Fore.RED}BŁĄD KRYTYCZNY: Niezgodność stref układu współrzędnych!"
@@ -701,7 +692,7 @@ def main(config_path: str):
         print(
             f"{Fore.CYAN}\n--- Przetwarzanie rozrzedzonej siatki ---{Style.RESET_ALL}"
         )
-        punkty_dokladne_df = results_df[results_df["osiaga_dokladnosc"] == "Tak"].copy()
+        punkty_dokladne_df = results_df[accuracy_mask(results_df)].copy()
         if not punkty_dokladne_df.empty:
             wyniki_siatki_df = znajdz_punkty_dla_siatki(
                 punkty_dokladne_df, zakres_df[["x", "y"]].values, sparse_grid_distance
@@ -18,6 +18,7 @@ from .ui_helpers import (
     get_autonumber_prefix,
 )
 from .config_manager import load_config, save_config_for_mode
+from .cache_dir import get_user_cache_dir
 
 __all__ = [
     "setup_logging",
@@ -35,4 +36,5 @@ __all__ = [
     "get_comparison_tolerance",
     "get_grid_spacing",
     "get_autonumber_prefix",
+    "get_user_cache_dir",
 ]
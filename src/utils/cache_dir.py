@@ -0,0 +1,31 @@
+"""
+Katalog pamięci podręcznej programu dla bieżącego użytkownika
+"""
+
+import os
+import sys
+
+APP_NAME = "diffH"
+
+
+def get_user_cache_dir(*subdirs: str) -> str:
+    """
+    Zwraca ścieżkę katalogu pamięci podręcznej programu (katalog nie jest tworzony).
+    Domyślnie jest to katalog użytkownika, a nie katalog programu, który może być
+    tylko do odczytu lub współdzielony:
+      - Windows: %LOCALAPPDATA%\\diffH\\Cache
+      - macOS: ~/Library/Caches/diffH
+      - pozostałe: $XDG_CACHE_HOME/diffH (domyślnie ~/.cache/diffH)
+    Zmienna środowiskowa DIFFH_CACHE_DIR pozwala wskazać inny katalog.
+    """
+    base = os.environ.get("DIFFH_CACHE_DIR")
+    if not base:
+        if os.name == "nt":
+            local_app_data = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+            base = os.path.join(local_app_data, APP_NAME, "Cache")
+        elif sys.platform == "darwin":
+            base = os.path.join(os.path.expanduser("~/Library/Caches"), APP_NAME)
+        else:
+            xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+            base = os.path.join(xdg_cache, APP_NAME)
+    return os.path.join(base, *subdirs)
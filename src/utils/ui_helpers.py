@@ -12,6 +12,57 @@ def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
 
+# Krótki znak zachęty wyświetlany po błędnej odpowiedzi zamiast całego pytania
+RETRY_PROMPT = f"{Fore.YELLOW}> {Style.RESET_ALL}"
+
+
+def _ask_number(prompt: str, parse, is_valid, invalid_msg: str, default, default_label: str,
+                parse_error: str = "Błąd: Wprowadź poprawną liczbę."):
+    """
+    Pyta o wartość liczbową. Pełne pytanie jest wyświetlane tylko raz; po błędnej
+    odpowiedzi wyświetlany jest sam komunikat błędu i krótki znak zachęty.
+    Pusta odpowiedź oznacza wartość domyślną.
+    """
+    answer = input(prompt)
+    while True:
+        if not answer.strip():
+            print(f"{Fore.CYAN}Przyjęto domyślną wartość: {default_label}{Style.RESET_ALL}")
+            return default
+        try:
+            value = parse(answer.strip())
+        except ValueError:
+            print(f"{Fore.RED}{parse_error}{Style.RESET_ALL}")
+        else:
+            if is_valid(value):
+                return value
+            print(f"{Fore.RED}{invalid_msg}{Style.RESET_ALL}")
+        answer = input(RETRY_PROMPT)
+
+
+def _ask_yes_no(prompt: str, default: bool) -> bool:
+    """
+    Zadaje pytanie tak/nie (pełne pytanie wyświetlane raz). Pusta odpowiedź
+    oznacza wartość domyślną.
+    """
+    answer = input(prompt)
+    while True:
+        resp = answer.strip().lower()
+        if not resp:
+            print(f"{Fore.CYAN}Przyjęto domyślną odpowiedź: {'t' if default else 'n'}{Style.RESET_ALL}")
+            return default
+        if resp in ["t", "tak", "y", "yes"]:
+            return True
+        if resp in ["n", "nie", "no"]:
+            return False
+        print(f"{Fore.YELLOW}Wpisz 't' (tak) lub 'n' (nie).{Style.RESET_ALL}")
+        answer = input(RETRY_PROMPT)
+
+
+def _parse_float(text: str) -> float:
+    """ Zamienia tekst na liczbę, akceptując przecinek dziesiętny. """
+    return float(text.replace(",", "."))
+
+
 def display_welcome_screen():
     """Wyświetla ekran powitalny aplikacji"""
     print(f"{Fore.GREEN}======================================")
@@ -30,31 +81,33 @@ def display_welcome_screen():
     )
     print("   - Separatory: średnik, przecinek lub spacja/tab")
     print("\n2. Pliki wynikowe:")
-    print("   - Pełne wyniki: wynik.csv, wynik.gpkg")
-    print("   - Punkty spełniające dokładność: wynik_dokladne.csv, wynik_dokladne.gpkg")
-    print("   - Punkty niespełniające: wynik_niedokladne.csv, wynik_niedokladne.gpkg")
+    print("   - Pełne wyniki: wynik.csv, wynik.gpkg (warstwa 'wszystkie')")
+    print("   - Punkty spełniające dokładność: wynik_dokladne.csv, warstwa 'dokladne' w wynik.gpkg")
+    print("   - Punkty niespełniające: wynik_niedokladne.csv, warstwa 'niedokladne' w wynik.gpkg")
     print("   - Opcjonalnie: wynik_siatka.csv, wynik_siatka.gpkg (siatka rozrzedzona)")
     print("\n3. Postępuj zgodnie z instrukcjami na ekranie.\n")
 
 
 def get_user_choice() -> int:
     """Pobiera wybór użytkownika dotyczący rodzaju porównania"""
+    print(
+        f"\n{Fore.YELLOW}Wybierz tryb działania programu:\n"
+        f"[1] Porównanie z innym plikiem pomiarowym\n"
+        f"[2] Porównanie z danymi z Geoportal.gov.pl (NMT)\n"
+        f"[3] Porównanie z obydwoma źródłami (plik + Geoportal.gov.pl)\n"
+        f"[4] Pobranie wysokości z Geoportal.gov.pl dla pliku z punktami (XY)\n"
+        f"[5] Wygenerowanie siatki punktów w zadanym zakresie i pobranie dla nich wysokości"
+    )
+    prompt = f"\n{Fore.YELLOW}Twój wybór (1-5): {Style.RESET_ALL}"
     while True:
-        print(
-            f"\n{Fore.YELLOW}Wybierz tryb działania programu:\n"
-            f"[1] Porównanie z innym plikiem pomiarowym\n"
-            f"[2] Porównanie z danymi z Geoportal.gov.pl (NMT)\n"
-            f"[3] Porównanie z obydwoma źródłami (plik + Geoportal.gov.pl)\n"
-            f"[4] Pobranie wysokości z Geoportal.gov.pl dla pliku z punktami (XY)\n"
-            f"[5] Wygenerowanie siatki punktów w zadanym zakresie i pobranie dla nich wysokości"
-        )
         try:
-            choice = int(input(f"\n{Fore.YELLOW}Twój wybór (1-5): {Style.RESET_ALL}"))
+            choice = int(input(prompt))
             if 1 <= choice <= 5:
                 return choice
             print(f"{Fore.RED}Błąd: Wybierz liczbę od 1 do 5.")
         except ValueError:
             print(f"{Fore.RED}Błąd: Wprowadź poprawną liczbę.")
+        prompt = f"{Fore.YELLOW}Twój wybór (1-5): {Style.RESET_ALL}"
 
 
 def ask_load_config(settings: dict) -> bool:
@@ -79,23 +132,10 @@ def ask_load_config(settings: dict) -> bool:
         label = translations.get(key, key.replace("_", " ").capitalize())
         print(f"  - {label}: {Fore.GREEN}{value}{Style.RESET_ALL}")
 
-    default = "t"
-    while True:
-        resp = (
-            input(
-                f"\n{Fore.YELLOW}Czy chcesz użyć powyższych ustawień? [t/n] (domyślnie: t): {Style.RESET_ALL}"
-            )
-            .strip()
-            .lower()
-        )
-        if not resp:
-            print(f"{Fore.CYAN}Przyjęto domyślną odpowiedź: {default}{Style.RESET_ALL}")
-            return True
-        if resp in ["t", "tak", "y", "yes"]:
-            return True
-        if resp in ["n", "nie", "no"]:
-            return False
-        print(f"{Fore.YELLOW}Wpisz 't' (tak) lub 'n' (nie).{Style.RESET_ALL}")
+    return _ask_yes_no(
+        f"\n{Fore.YELLOW}Czy chcesz użyć powyższych ustawień? [t/n] (domyślnie: t): {Style.RESET_ALL}",
+        default=True,
+    )
 
 
 def get_file_path(prompt: str) -> str:
@@ -121,24 +161,18 @@ def get_max_distance() -> float:
         float: Maksymalna odległość wyszukiwania pary w metrach.
     """
     default_distance = 15.0
-    while True:
-        try:
-            prompt = (
-                f"\n{Fore.YELLOW}Podaj maksymalną odległość wyszukiwania pary w metrach (np. 0.5)\n"
-                f"(Wpisz 0, aby pominąć ten warunek, domyślnie {default_distance} m): {Style.RESET_ALL}"
-            )
-            distance_str = input(prompt)
-            if not distance_str.strip():
-                print(
-                    f"{Fore.CYAN}Przyjęto domyślną wartość: {default_distance} m{Style.RESET_ALL}"
-                )
-                return default_distance
-            distance = float(distance_str.replace(",", "."))
-            if distance >= 0:
-                return distance
-            print(f"{Fore.RED}Błąd: Odległość nie może być ujemna.{Style.RESET_ALL}")
-        except ValueError:
-            print(f"{Fore.RED}Błąd: Wprowadź poprawną liczbę.{Style.RESET_ALL}")
+    prompt = (
+        f"\n{Fore.YELLOW}Podaj maksymalną odległość wyszukiwania pary w metrach (np. 0.5)\n"
+        f"(Wpisz 0, aby pominąć ten warunek, domyślnie {default_distance} m): {Style.RESET_ALL}"
+    )
+    return _ask_number(
+        prompt,
+        _parse_float,
+        lambda distance: distance >= 0,
+        "Błąd: Odległość nie może być ujemna.",
+        default_distance,
+        f"{default_distance} m",
+    )
 
 
 def ask_swap_xy(file_label: str) -> bool:
@@ -149,23 +183,10 @@ def ask_swap_xy(file_label: str) -> bool:
     Returns:
         bool: True jeśli kolumny są zamienione, False jeśli nie.
     """
-    default = "n"
-    while True:
-        resp = (
-            input(
-                f"{Fore.YELLOW}Czy plik {file_label} ma zamienioną kolejność kolumn (Y,X zamiast X,Y)? [t/n] (domyślnie: n): {Style.RESET_ALL}"
-            )
-            .strip()
-            .lower()
-        )
-        if not resp:
-            print(f"{Fore.CYAN}Przyjęto domyślną odpowiedź: {default}{Style.RESET_ALL}")
-            return False
-        if resp in ["t", "tak", "y", "yes"]:
-            return True
-        if resp in ["n", "nie", "no"]:
-            return False
-        print(f"{Fore.YELLOW}Wpisz 't' (tak) lub 'n' (nie).{Style.RESET_ALL}")
+    return _ask_yes_no(
+        f"{Fore.YELLOW}Czy plik {file_label} ma zamienioną kolejność kolumn (Y,X zamiast X,Y)? [t/n] (domyślnie: n): {Style.RESET_ALL}",
+        default=False,
+    )
 
 
 def get_geoportal_tolerance() -> float:
@@ -176,24 +197,18 @@ def get_geoportal_tolerance() -> float:
         float: Dopuszczalna różnica wysokości względem Geoportalu w metrach.
     """
     default_tolerance = 0.2
-    while True:
-        try:
-            prompt = (
-                f"\n{Fore.YELLOW}Podaj dopuszczalną różnicę wysokości względem Geoportalu (w metrach, np. 0.2) "
-                f"(domyślnie: {default_tolerance}): {Style.RESET_ALL}"
-            )
-            val = input(prompt)
-            if not val.strip():
-                print(
-                    f"{Fore.CYAN}Przyjęto domyślną wartość: {default_tolerance}{Style.RESET_ALL}"
-                )
-                return default_tolerance
-            val = float(val.replace(",", "."))
-            if val >= 0:
-                return val
-            print(f"{Fore.RED}Błąd: Wartość nie może być ujemna.{Style.RESET_ALL}")
-        except ValueError:
-            print(f"{Fore.RED}Błąd: Wprowadź poprawną liczbę.{Style.RESET_ALL}")
+    prompt = (
+        f"\n{Fore.YELLOW}Podaj dopuszczalną różnicę wysokości względem Geoportalu (w metrach, np. 0.2) "
+        f"(domyślnie: {default_tolerance}): {Style.RESET_ALL}"
+    )
+    return _ask_number(
+        prompt,
+        _parse_float,
+        lambda val: val >= 0,
+        "Błąd: Wartość nie może być ujemna.",
+        default_tolerance,
+        f"{default_tolerance}",
+    )
 
 
 def get_comparison_tolerance() -> float:
@@ -201,24 +216,18 @@ def get_comparison_tolerance() -> float:
     Funkcja do pobrania dopuszczalnej różnicy wysokości względem pliku wejściowego w metrach.
     """
     default_tolerance = 0.2
-    while True:
-        try:
-            prompt = (
-                f"\n{Fore.YELLOW}Podaj dopuszczalną różnicę wysokości względem pliku wejściowego (w metrach, np. 0.2) "
-                f"(domyślnie: {default_tolerance}): {Style.RESET_ALL}"
-            )
-            val = input(prompt)
-            if not val.strip():
-                print(
-                    f"{Fore.CYAN}Przyjęto domyślną wartość: {default_tolerance}{Style.RESET_ALL}"
-                )
-                return default_tolerance
-            val = float(val.replace(",", "."))
-            if val >= 0:
-                return val
-            print(f"{Fore.RED}Błąd: Wartość nie może być ujemna.{Style.RESET_ALL}")
-        except ValueError:
-            print(f"{Fore.RED}Błąd: Wprowadź poprawną liczbę.{Style.RESET_ALL}")
+    prompt = (
+        f"\n{Fore.YELLOW}Podaj dopuszczalną różnicę wysokości względem pliku wejściowego (w metrach, np. 0.2) "
+        f"(domyślnie: {default_tolerance}): {Style.RESET_ALL}"
+    )
+    return _ask_number(
+        prompt,
+        _parse_float,
+        lambda val: val >= 0,
+        "Błąd: Wartość nie może być ujemna.",
+        default_tolerance,
+        f"{default_tolerance}",
+    )
 
 
 def get_round_decimals() -> int:
@@ -229,46 +238,30 @@ def get_round_decimals() -> int:
         int: Liczba miejsc po przecinku do zaokrąglenia danych wejściowych.
     """
     default_decimals = 2
-    while True:
-        try:
-            prompt = f"\n{Fore.YELLOW}Podaj liczbę miejsc po przecinku dla różnic wysokości (domyślnie: {default_decimals}): {Style.RESET_ALL}"
-            val = input(prompt)
-            if not val.strip():
-                print(
-                    f"{Fore.CYAN}Przyjęto domyślną wartość: {default_decimals}{Style.RESET_ALL}"
-                )
-                return default_decimals
-            val_int = int(val)
-            if 0 <= val_int <= 6:
-                return val_int
-            print(f"{Fore.RED}Błąd: Podaj liczbę z zakresu 0-6.{Style.RESET_ALL}")
-        except ValueError:
-            print(
-                f"{Fore.RED}Błąd: Wprowadź poprawną liczbę całkowitą.{Style.RESET_ALL}"
-            )
+    prompt = f"\n{Fore.YELLOW}Podaj liczbę miejsc po przecinku dla różnic wysokości (domyślnie: {default_decimals}): {Style.RESET_ALL}"
+    return _ask_number(
+        prompt,
+        int,
+        lambda val_int: 0 <= val_int <= 6,
+        "Błąd: Podaj liczbę z zakresu 0-6.",
+        default_decimals,
+        f"{default_decimals}",
+        parse_error="Błąd: Wprowadź poprawną liczbę całkowitą.",
+    )
 
 
 def get_grid_spacing() -> float:
     """Pobiera od użytkownika oczekiwany odstęp siatki w metrach."""
     default_spacing = DEFAULT_SPARSE_GRID_DISTANCE
-    while True:
-        try:
-            prompt = f"\n{Fore.YELLOW}Podaj oczekiwany odstęp pomiędzy punktami siatki (w metrach, domyślnie: {default_spacing}): {Style.RESET_ALL}"
-            dist_val = input(prompt).strip()
-            if not dist_val:
-                print(
-                    f"{Fore.CYAN}Przyjęto domyślną wartość: {default_spacing} m{Style.RESET_ALL}"
-                )
-                return default_spacing
-
-            parsed_dist = float(dist_val.replace(",", "."))
-            if parsed_dist > 0:
-                return parsed_dist
-            print(
-                f"{Fore.RED}Błąd: Odstęp musi być wartością dodatnią.{Style.RESET_ALL}"
-            )
-        except ValueError:
-            print(f"{Fore.RED}Błąd: Wprowadź poprawną liczbę.{Style.RESET_ALL}")
+    prompt = f"\n{Fore.YELLOW}Podaj oczekiwany odstęp pomiędzy punktami siatki (w metrach, domyślnie: {default_spacing}): {Style.RESET_ALL}"
+    return _ask_number(
+        prompt,
+        _parse_float,
+        lambda parsed_dist: parsed_dist > 0,
+        "Błąd: Odstęp musi być wartością dodatnią.",
+        default_spacing,
+        f"{default_spacing} m",
+    )
 
 
 def get_autonumber_prefix() -> str:
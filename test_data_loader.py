@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Testy wczytywania plików tekstowych przez parser pyarrow i parser C
+"""
+
+import os
+import sys
+import pytest
+
+# Dodaj katalog src do ścieżki Pythona
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from src.core import data_loader
+
+# Drugi wiersz nie ma wysokości - parser C uzupełnia go pustą wartością
+RAGGED_CSV = (
+    "1;7500000.10;5600000.20;100.5\n"
+    "2;7500001.10;5600001.20\n"
+    "3;7500002.10;5600002.20;101.5\n"
+)
+
+
+@pytest.fixture(params=["c", "pyarrow"])
+def engine(request, monkeypatch):
+    """ Wymusza parser C lub pyarrow w data_loader (bez pamięci podręcznej). """
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(data_loader, "PYARROW_AVAILABLE", request.param == "pyarrow")
+    monkeypatch.setattr(data_loader, "INPUT_CACHE_ENABLED", False)
+    return request.param
+
+
+@pytest.fixture
+def ragged_file(tmp_path):
+    path = tmp_path / "punkty.csv"
+    path.write_text(RAGGED_CSV)
+    return str(path)
+
+
+def test_read_delimited_keeps_short_rows(engine, ragged_file):
+    """Krótszy wiersz nie jest pomijany niezależnie od parsera"""
+    df = data_loader.read_delimited(ragged_file, ";")
+    assert len(df) == 3
+    assert df.iloc[1, :3].tolist() == ["2", "7500001.10", "5600001.20"]
+
+
+def test_load_data_ragged_row_same_for_both_engines(engine, ragged_file):
+    """Punkt XY z wiersza bez wysokości jest wczytywany w trybie 4"""
+    df = data_loader.load_data(ragged_file, expect_height_column=False)
+    assert df is not None
+    assert df["id"].tolist() == ["1", "2", "3"]
+
+
+def test_load_data_ragged_row_rejected_with_height(engine, ragged_file):
+    """Plik z brakującą wysokością jest odrzucany przez oba parsery (tryby 1-3)"""
+    assert data_loader.load_data(ragged_file, expect_height_column=True) is None
+
+
+@pytest.fixture
+def input_cache_dir(tmp_path, monkeypatch):
+    """ Pamięć podręczna plików wejściowych w katalogu tymczasowym (wymaga pyarrow). """
+    pytest.importorskip("pyarrow")
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(data_loader, "PYARROW_AVAILABLE", True)
+    monkeypatch.setattr(data_loader, "INPUT_CACHE_ENABLED", True)
+    monkeypatch.setattr(data_loader, "INPUT_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+def test_input_cache_detects_rewrite_with_same_mtime(input_cache_dir, tmp_path):
+    """Plik zmieniony bez zmiany daty modyfikacji i rozmiaru nie jest czytany z pamięci podręcznej"""
+    path = tmp_path / "punkty.csv"
+    path.write_text("1;7500000.10;5600000.20;100.5\n2;7500001.10;5600001.20;101.5\n")
+    stat = os.stat(path)
+    first = data_loader.load_data(str(path))
+    assert len(list(input_cache_dir.iterdir())) == 1
+
+    path.write_text("1;7500000.10;5600000.20;100.5\n2;7500001.10;5600001.20;109.5\n")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    second = data_loader.load_data(str(path))
+    assert first["h"].tolist() == [100.5, 101.5]
+    assert second["h"].tolist() == [100.5, 109.5]
+
+
+def test_prune_input_cache_removes_least_recently_used(input_cache_dir):
+    input_cache_dir.mkdir()
+    for age, name in enumerate(["nowy", "sredni", "stary"]):
+        entry = input_cache_dir / f"{name}.parquet"
+        entry.write_bytes(b"x" * 100)
+        os.utime(entry, (1_000_000 - age, 1_000_000 - age))
+    data_loader.prune_input_cache(max_bytes=250)
+    assert sorted(p.name for p in input_cache_dir.iterdir()) == ["nowy.parquet", "sredni.parquet"]
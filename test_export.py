@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Testy zapisu wyników do plików CSV
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Dodaj katalog src do ścieżki Pythona
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from src.core import export
+
+
+def results_frame(diff_values):
+    return pd.DataFrame(
+        {
+            "id_odniesienia": pd.array(["P1", "P;2", None], dtype="str"),
+            "x_odniesienia": [5600000.12, 5600001.5, 5600002.0],
+            "h_odniesienia": [101.25, np.nan, 99.0],
+            "diff_h_geoportal": diff_values,
+            "osiaga_dokladnosc": ["Tak", "Nie", None],
+        }
+    )
+
+
+def test_polars_writes_like_pandas():
+    assert export.polars_writes_like_pandas(results_frame([0.12, -0.0, np.nan]))
+    # pandas zapisuje 1e-05, Polars 0.00001
+    assert not export.polars_writes_like_pandas(results_frame([0.00001, 0.5, 0.1]))
+    assert not export.polars_writes_like_pandas(
+        pd.DataFrame({"b": pd.array([True, False], dtype="boolean")})
+    )
+
+
+@pytest.mark.parametrize("diff_values", [[0.12, -0.0, np.nan], [0.00001, 0.5, 0.1]])
+def test_write_results_csv_same_output_with_and_without_polars(
+    diff_values, tmp_path, monkeypatch
+):
+    """Zawartość pliku CSV nie zależy od tego, czy Polars jest zainstalowany"""
+    pytest.importorskip("polars")
+    df = results_frame(diff_values)
+    polars_path, pandas_path = tmp_path / "polars.csv", tmp_path / "pandas.csv"
+    export.write_results_csv(df, str(polars_path))
+    monkeypatch.setattr(export, "POLARS_AVAILABLE", False)
+    export.write_results_csv(df, str(pandas_path))
+    assert polars_path.read_bytes() == pandas_path.read_bytes()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Testy pamięci podręcznej wysokości z Geoportalu
+"""
+
+import os
+import sys
+import time
+import pytest
+
+# Dodaj katalog src do ścieżki Pythona
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from src.core import geoportal_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    """ Baza pamięci podręcznej w katalogu tymczasowym. """
+    path = tmp_path / "cache" / "heights.sqlite"
+    monkeypatch.setattr(geoportal_cache, "CACHE_PATH", str(path))
+    monkeypatch.setattr(geoportal_cache, "GEOPORTAL_CACHE_ENABLED", True)
+    monkeypatch.setattr(geoportal_cache, "GEOPORTAL_CACHE_MAX_AGE_DAYS", 90)
+    return path
+
+
+def test_store_and_load_heights():
+    geoportal_cache.store_heights({1: 101.5, 2: 0.0, 3: float("nan")})
+    # 0.0 i NaN nie są zapamiętywane
+    assert geoportal_cache.load_cached_heights([1, 2, 3]) == {1: 101.5}
+
+
+def test_expired_heights_are_not_used(monkeypatch):
+    geoportal_cache.store_heights({1: 101.5})
+    # Wysokość pobrana 91 dni temu jest już nieaktualna
+    monkeypatch.setattr(time, "time", lambda now=time.time(): now + 91 * 86400)
+    assert geoportal_cache.load_cached_heights([1]) == {}
+    monkeypatch.setattr(geoportal_cache, "GEOPORTAL_CACHE_MAX_AGE_DAYS", 0)
+    assert geoportal_cache.load_cached_heights([1]) == {1: 101.5}
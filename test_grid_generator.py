@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testy wyboru punktów siatki heksagonalnej
+"""
+
+import io
+import os
+import sys
+import contextlib
+import numpy as np
+import pandas as pd
+from matplotlib.path import Path
+
+# Dodaj katalog src do ścieżki Pythona
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from src.core.grid_generator import (
+    generuj_srodki_heksagonalne_wektorowo,
+    znajdz_punkty_dla_siatki,
+)
+
+
+def wybierz_punkty_referencyjnie(punkty_np, obszar, odleglosc):
+    """Wybór jak w pierwotnej implementacji: zapytanie KDTree i min() dla każdego środka"""
+    from scipy.spatial import KDTree
+
+    drzewo = KDTree(punkty_np[:, :2])
+    odwiedzone, wybrane = set(), []
+    for srodek in generuj_srodki_heksagonalne_wektorowo(obszar, odleglosc):
+        kandydaci = [
+            idx
+            for idx in drzewo.query_ball_point(srodek, r=odleglosc / 2.0)
+            if idx not in odwiedzone
+        ]
+        if not kandydaci:
+            continue
+        najlepszy = min(
+            kandydaci,
+            key=lambda idx: (
+                abs(punkty_np[idx, 2] - punkty_np[idx, 3]),
+                np.linalg.norm(punkty_np[idx, :2] - srodek),
+            ),
+        )
+        odwiedzone.add(najlepszy)
+        wybrane.append(najlepszy)
+    return wybrane
+
+
+def test_grid_selection_matches_reference_with_ties():
+    """Regularna siatka punktów - wiele pełnych remisów różnicy wysokości i odległości"""
+    rng = np.random.default_rng(3)
+    wsp = np.arange(0.0, 200.0, 1.0)
+    x, y = np.meshgrid(wsp, wsp)
+    punkty = pd.DataFrame(
+        {
+            "id_odniesienia": [f"P{i}" for i in range(x.size)],
+            "x_odniesienia": x.ravel(),
+            "y_odniesienia": y.ravel(),
+            "h_odniesienia": rng.integers(0, 3, x.size) * 0.1,
+            "geoportal_h": 0.0,
+        }
+    )
+    obszar = np.array([[0.0, 0.0], [200.0, 0.0], [200.0, 200.0], [0.0, 200.0]])
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        wynik = znajdz_punkty_dla_siatki(punkty, obszar, 10.0)
+
+    # Wybór odbywa się tylko spośród punktów wewnątrz zakresu
+    wewnatrz = Path(obszar).contains_points(punkty[["x_odniesienia", "y_odniesienia"]].to_numpy())
+    punkty_w_obszarze = punkty[wewnatrz]
+    oczekiwane = wybierz_punkty_referencyjnie(
+        punkty_w_obszarze[
+            ["x_odniesienia", "y_odniesienia", "h_odniesienia", "geoportal_h"]
+        ].to_numpy(),
+        obszar,
+        10.0,
+    )
+    assert len(oczekiwane) > 0
+    assert (
+        wynik["id_odniesienia"].tolist()
+        == punkty_w_obszarze["id_odniesienia"].iloc[oczekiwane].tolist()
+    )
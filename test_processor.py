@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Testy funkcji pomocniczych modułu przetwarzania danych
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+# Dodaj katalog src do ścieżki Pythona
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from src.core.processor import round_like_builtin
+
+
+@pytest.mark.parametrize("decimals", range(7))
+def test_round_like_builtin_matches_round(decimals):
+    """Wynik zgodny z round() także dla remisów dziesiętnych (np. 38.735)"""
+    rng = np.random.default_rng(decimals)
+    values = np.concatenate(
+        [
+            rng.normal(0, 50, 20_000),
+            # wartości z jedną cyfrą więcej - dużo remisów na ostatniej cyfrze
+            np.round(rng.normal(0, 50, 20_000), decimals + 1),
+            (rng.integers(-10**6, 10**6, 20_000) + 0.5) / 10**decimals,
+            [0.0, -0.0, 0.5, 1.5, 2.5, 38.735, -38.735, 1e9 + 0.005],
+        ]
+    )
+    expected = np.array([round(v, decimals) for v in values.tolist()])
+    np.testing.assert_array_equal(round_like_builtin(values, decimals), expected)
+
+
+def test_round_like_builtin_keeps_nan():
+    result = round_like_builtin(np.array([np.nan, 1.005]), 2)
+    assert np.isnan(result[0]) and result[1] == round(1.005, 2)